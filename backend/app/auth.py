@@ -3,24 +3,82 @@ Authentication utilities for API key management.
 Provides optional API key authentication for link creation.
 """
 
+import base64
 import hashlib
 import secrets
-from datetime import datetime, timezone
-from typing import Optional, Tuple
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Optional, Tuple, Union
 
 from fastapi import Request, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, lambda_stmt, or_, select
 from sqlalchemy.orm import Session
 
 from .database import get_db
 from .models import ApiKey
+from .redis_client import RedisService
+from .env import get_int_optional
+from .local_cache import TTLCache
 from .logging_config import get_logger
+from .utils import utc_now, utc_now_coarse
 
 logger = get_logger(__name__)
 
+# Sentinel for "not yet resolved" on request.state (None means "no valid key")
+_UNSET = object()
 
-def hash_api_key(key: str) -> str:
-    """Hash an API key using SHA-256."""
-    return hashlib.sha256(key.encode()).hexdigest()
+# hashlib's SHA-256 is OpenSSL's EVP implementation, which already selects the
+# SHA-NI code path at runtime on CPUs that support it; bind it once here.
+_sha256 = hashlib.sha256
+
+API_KEY_PREFIX = "lks_"
+_API_KEY_PREFIX_BYTES = API_KEY_PREFIX.encode("ascii")
+API_KEY_RANDOM_BYTES = 32
+# Prefix plus 32 random bytes as unpadded urlsafe base64 (always 43 characters)
+API_KEY_LENGTH = len(API_KEY_PREFIX) + 43
+
+# Pending last_used_at bumps (api_key_id -> latest use), flushed in batches by
+# the background task runner instead of committing on every request.
+_pending_usage: Dict[int, datetime] = {}
+_pending_usage_lock = threading.Lock()
+
+# Hashes of all active keys, used to reject unknown keys without a DB/Redis
+# lookup. None until loaded at startup (filtering disabled). Rebound rather
+# than mutated so readers never need a lock.
+_active_key_hashes: Optional[frozenset] = None
+
+# A key missing from the filter may have been created by another process since
+# the last reload, so a miss is checked against the DB. Hashes the DB rejected
+# are remembered briefly, so a repeated bad key is refused without a query; a
+# per-worker cap on miss lookups per second is only a backstop against
+# scanners sending a fresh random key every time.
+_rejected_key_hashes = TTLCache(
+    maxsize=10000,
+    ttl=get_int_optional("API_KEY_FILTER_MISS_TTL_MS", 2000) / 1000,
+)
+API_KEY_FILTER_MISS_LOOKUPS_PER_SECOND = get_int_optional("API_KEY_FILTER_MISS_LOOKUPS_PER_SECOND", 50)
+_miss_window_start = float("-inf")
+_miss_window_lookups = 0
+
+# Module-level cached statements for the auth hot path
+_ACTIVE_KEY_BY_HASH = lambda_stmt(
+    lambda: select(ApiKey).where(
+        ApiKey.key_hash == bindparam("key_hash"),
+        ApiKey.is_active.is_(True),
+    )
+)
+_KEY_BY_ID = lambda_stmt(lambda: select(ApiKey).where(ApiKey.id == bindparam("key_id")))
+_ACTIVE_KEY_HASHES = lambda_stmt(lambda: select(ApiKey.key_hash).where(ApiKey.is_active.is_(True)))
+
+
+def hash_api_key(key: Union[str, bytes]) -> str:
+    """Hash an API key using SHA-256. Accepts pre-encoded bytes."""
+    if isinstance(key, str):
+        key = key.encode()
+    return _sha256(key).digest().hex()
 
 
 def generate_api_key() -> Tuple[str, str]:
@@ -29,10 +87,14 @@ def generate_api_key() -> Tuple[str, str]:
     Returns (plaintext_key, hashed_key).
     The plaintext key should only be shown once to the user.
     """
-    # Generate a secure random key with prefix for easy identification
-    key = f"lks_{secrets.token_urlsafe(32)}"
-    key_hash = hash_api_key(key)
-    return key, key_hash
+    return _key_from_random(secrets.token_bytes(API_KEY_RANDOM_BYTES))
+
+
+def _key_from_random(raw: bytes) -> Tuple[str, str]:
+    """Build a prefixed key from random bytes and hash it without re-encoding."""
+    # Prefix makes keys easy to identify
+    key_bytes = _API_KEY_PREFIX_BYTES + base64.urlsafe_b64encode(raw).rstrip(b"=")
+    return key_bytes.decode("ascii"), hash_api_key(key_bytes)
 
 
 def validate_api_key(db: Session, key: str) -> Optional[ApiKey]:
@@ -40,33 +102,156 @@ def validate_api_key(db: Session, key: str) -> Optional[ApiKey]:
     Validate an API key and return the ApiKey model if valid.
     Returns None if the key is invalid or inactive.
     """
+    key_hash = _hash_candidate_key(key)
+    if key_hash is None:
+        return None
+    return _resolve_api_key(db, key_hash)
+
+
+def _hash_candidate_key(key: str) -> Optional[str]:
+    """
+    Cheap, I/O-free checks on a presented key.
+    Returns its hash if it could be an active key, otherwise None.
+    """
     if not key:
         return None
     
     # Remove any whitespace
     key = key.strip()
     
-    # Check for valid prefix
-    if not key.startswith("lks_"):
+    # Check for valid prefix and length before paying for a hash + DB lookup
+    if len(key) != API_KEY_LENGTH or not key.startswith(API_KEY_PREFIX):
         return None
     
-    key_hash = hash_api_key(key)
+    # Generated keys are pure ASCII; anything else can't be valid
+    if not key.isascii():
+        return None
     
-    api_key = db.query(ApiKey).filter(
-        ApiKey.key_hash == key_hash,
-        ApiKey.is_active == True
-    ).first()
+    key_hash = _cached_key_hash(key)
     
-    if api_key:
-        # Update last used timestamp
-        api_key.last_used_at = datetime.now(timezone.utc)
-        db.commit()
-        logger.info(f"API key used: {api_key.name or 'unnamed'}")
+    # Known-bad keys stop here; other misses get a (capped) DB lookup
+    active = _active_key_hashes
+    if active is not None and key_hash not in active:
+        if _rejected_key_hashes.get(key_hash) or not _take_filter_miss_lookup():
+            return None
+    
+    return key_hash
+
+
+def _take_filter_miss_lookup() -> bool:
+    """Whether this second's budget of filter-miss DB lookups has room left."""
+    global _miss_window_start, _miss_window_lookups
+    now = time.monotonic()
+    if now - _miss_window_start >= 1:
+        _miss_window_start, _miss_window_lookups = now, 0
+    if _miss_window_lookups >= API_KEY_FILTER_MISS_LOOKUPS_PER_SECOND:
+        return False
+    _miss_window_lookups += 1
+    return True
+
+
+def _resolve_api_key(db: Session, key_hash: str) -> Optional[ApiKey]:
+    """Look up an active key by hash (Redis cache, then DB) and record its use."""
+    # Active keys are cached in Redis so most requests skip the DB entirely;
+    # cached hits are returned as transient (session-less) ApiKey objects.
+    cached = RedisService.get_cached_api_key(key_hash)
+    if cached is not None:
+        api_key = ApiKey(key_hash=key_hash, **cached)
+    else:
+        api_key = db.execute(_ACTIVE_KEY_BY_HASH, {"key_hash": key_hash}).scalar_one_or_none()
+        if api_key:
+            RedisService.cache_api_key(key_hash, {
+                "id": api_key.id,
+                "name": api_key.name,
+                "rate_limit": api_key.rate_limit,
+                "is_active": True,
+            })
+    
+    if not api_key:
+        _rejected_key_hashes.set(key_hash, True)
+    else:
+        # Keys created elsewhere skip the miss lookup from now on
+        _update_active_key_filter(key_hash, True)
+        # Record usage; last_used_at is advisory so it is written in batches
+        record_api_key_usage(api_key.id, utc_now_coarse())
+        logger.info("API key used: %s", api_key.name or "unnamed")
     
     return api_key
 
 
-def get_optional_api_key(
+@lru_cache(maxsize=512)
+def _cached_key_hash(key: str) -> str:
+    """
+    Hash a well-formed presented key, memoized so returning clients skip
+    SHA-256 entirely. Only the key -> hash mapping is cached (never the row),
+    so deactivation still takes effect immediately. Note this keeps up to
+    512 recently presented plaintext keys in process memory.
+    """
+    return hash_api_key(key.encode("ascii"))
+
+
+def load_active_key_filter(db: Session) -> int:
+    """
+    (Re)load the in-memory set of active key hashes from the database.
+    Keys created by other processes are also picked up by the rate-limited
+    miss lookup; the reload drops keys deactivated elsewhere.
+    Returns the number of active keys.
+    """
+    global _active_key_hashes
+    _active_key_hashes = frozenset(db.execute(_ACTIVE_KEY_HASHES).scalars())
+    return len(_active_key_hashes)
+
+
+def _update_active_key_filter(key_hash: str, active: bool) -> None:
+    """Apply a local key creation/deactivation to the loaded filter."""
+    global _active_key_hashes
+    current = _active_key_hashes
+    if current is None:
+        return
+    _active_key_hashes = current | {key_hash} if active else current - {key_hash}
+
+
+def record_api_key_usage(key_id: int, used_at: datetime) -> None:
+    """Queue a last_used_at update for an API key."""
+    with _pending_usage_lock:
+        previous = _pending_usage.get(key_id)
+        if previous is None or used_at > previous:
+            _pending_usage[key_id] = used_at
+
+
+def flush_api_key_usage(db: Session) -> int:
+    """
+    Write queued last_used_at updates in a single executemany UPDATE.
+    Never moves last_used_at backwards. Returns number of keys flushed.
+    """
+    global _pending_usage
+    with _pending_usage_lock:
+        if not _pending_usage:
+            return 0
+        pending, _pending_usage = _pending_usage, {}
+    
+    table = ApiKey.__table__
+    stmt = (
+        table.update()
+        .where(
+            table.c.id == bindparam("key_id"),
+            or_(table.c.last_used_at.is_(None), table.c.last_used_at < bindparam("used_at")),
+        )
+        .values(last_used_at=bindparam("used_at"))
+    )
+    try:
+        db.execute(stmt, [{"key_id": k, "used_at": ts} for k, ts in pending.items()])
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Put the updates back so the next flush retries them
+        for key_id, used_at in pending.items():
+            record_api_key_usage(key_id, used_at)
+        raise
+    return len(pending)
+
+
+async def get_optional_api_key(
     request: Request,
     db: Session = Depends(get_db)
 ) -> Optional[ApiKey]:
@@ -74,7 +259,17 @@ def get_optional_api_key(
     FastAPI dependency to optionally extract and validate an API key.
     Returns the ApiKey if valid, None otherwise.
     Does not raise an error if no key is provided.
+    The result is memoized on ``request.state`` so repeated lookups within
+    the same request don't re-hash the key or hit the database again.
+    Missing or obviously invalid keys are rejected on the event loop; only
+    the Redis/DB lookup is run in the threadpool.
     """
+    cached = getattr(request.state, "api_key", _UNSET)
+    if cached is not _UNSET:
+        return cached
+
+    api_key = None
+
     # Check header first
     auth_header = request.headers.get("X-API-Key") or request.headers.get("Authorization")
     
@@ -83,13 +278,15 @@ def get_optional_api_key(
         if auth_header.startswith("Bearer "):
             auth_header = auth_header[7:]
         
-        api_key = validate_api_key(db, auth_header)
-        return api_key
+        key_hash = _hash_candidate_key(auth_header)
+        if key_hash is not None:
+            api_key = await run_in_threadpool(_resolve_api_key, db, key_hash)
     
-    return None
+    request.state.api_key = api_key
+    return api_key
 
 
-def require_api_key(
+async def require_api_key(
     request: Request,
     db: Session = Depends(get_db)
 ) -> ApiKey:
@@ -97,10 +294,13 @@ def require_api_key(
     FastAPI dependency to require a valid API key.
     Raises HTTPException if no valid key is provided.
     """
-    api_key = get_optional_api_key(request, db)
+    api_key = await get_optional_api_key(request, db)
     
     if not api_key:
-        logger.warning(f"Unauthorized API access attempt from {request.client.host if request.client else 'unknown'}")
+        logger.warning(
+            "Unauthorized API access attempt from %s",
+            request.client.host if request.client else "unknown",
+        )
         raise HTTPException(
             status_code=401,
             detail="Valid API key required. Provide X-API-Key header.",
@@ -115,8 +315,6 @@ def create_api_key(db: Session, name: Optional[str] = None, rate_limit: int = 10
     Create a new API key and store it in the database.
     Returns (plaintext_key, ApiKey model).
     """
-    from .utils import utc_now
-    
     key, key_hash = generate_api_key()
     
     api_key = ApiKey(
@@ -130,21 +328,24 @@ def create_api_key(db: Session, name: Optional[str] = None, rate_limit: int = 10
     db.add(api_key)
     db.commit()
     db.refresh(api_key)
+    _update_active_key_filter(key_hash, True)
     
-    logger.info(f"Created new API key: {name or 'unnamed'}")
+    logger.info("Created new API key: %s", name or "unnamed")
     
     return key, api_key
 
 
 def deactivate_api_key(db: Session, key_id: int) -> bool:
     """Deactivate an API key by ID."""
-    api_key = db.query(ApiKey).filter(ApiKey.id == key_id).first()
+    api_key = db.execute(_KEY_BY_ID, {"key_id": key_id}).scalar_one_or_none()
     
     if not api_key:
         return False
     
     api_key.is_active = False
     db.commit()
+    RedisService.delete_cached_api_key(api_key.key_hash)
+    _update_active_key_filter(api_key.key_hash, False)
     
-    logger.info(f"Deactivated API key: {api_key.name or 'unnamed'} (ID: {key_id})")
+    logger.info("Deactivated API key: %s (ID: %s)", api_key.name or "unnamed", key_id)
     return True
@@ -3,19 +3,64 @@ Cloudflare Turnstile CAPTCHA verification.
 Provides CAPTCHA verification for anonymous link creation.
 """
 
+import asyncio
 import httpx
+import orjson
+from functools import lru_cache
 from typing import Optional
 
-from .env import get_env_optional, get_bool_optional
+from .env import get_env_optional, get_bool_optional, get_int_optional
 from .logging_config import get_logger
 
 logger = get_logger(__name__)
 
 TURNSTILE_VERIFY_URL = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
 
+# Shared client so verifications reuse pooled TCP/TLS connections
+_client: Optional[httpx.AsyncClient] = None
+_client_lock = asyncio.Lock()
 
+# Bound concurrent verifications so bursts queue instead of opening many sockets
+_verify_semaphore = asyncio.Semaphore(get_int_optional("TURNSTILE_MAX_CONCURRENCY", 64))
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client for Turnstile, creating it on first use."""
+    global _client
+    if _client is None:
+        async with _client_lock:
+            if _client is None:
+                _client = httpx.AsyncClient(
+                    timeout=10.0,
+                    http2=True,
+                    limits=httpx.Limits(max_keepalive_connections=32),
+                )
+    return _client
+
+
+async def warm_up_http_client() -> None:
+    """Open the pooled connection to Cloudflare ahead of the first verification."""
+    if not is_turnstile_enabled():
+        return
+    try:
+        client = await get_http_client()
+        await client.get("https://challenges.cloudflare.com/")
+        logger.debug("Turnstile HTTP client warmed up")
+    except httpx.HTTPError as e:
+        logger.warning(f"Turnstile warm-up failed: {e}")
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client (called on application shutdown)."""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+
+
+@lru_cache(maxsize=1)
 def is_turnstile_enabled() -> bool:
-    """Check if Turnstile CAPTCHA is enabled."""
+    """Check if Turnstile CAPTCHA is enabled (read once per process)."""
     return get_bool_optional("TURNSTILE_ENABLED", False)
 
 
@@ -62,9 +107,10 @@ async def verify_turnstile(token: str, ip_address: Optional[str] = None) -> bool
         if ip_address:
             data["remoteip"] = ip_address
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        client = await get_http_client()
+        async with _verify_semaphore:
             response = await client.post(TURNSTILE_VERIFY_URL, data=data)
-            result = response.json()
+        result = orjson.loads(response.content)
         
         success = result.get("success", False)
         
@@ -2,9 +2,12 @@
 """
 CLI tool for managing API keys.
 Usage: python -m app.cli_tools generate_key [--name NAME] [--rate-limit LIMIT]
+       python -m app.cli_tools init
+       python -m app.cli_tools cleanup
 """
 
 import argparse
+import asyncio
 import sys
 from pathlib import Path
 
@@ -14,12 +17,24 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from app.database import get_db, engine, Base
 from app.auth import create_api_key, deactivate_api_key
 from app.models import ApiKey
+from app.env import get_bool_optional
+
+
+def init_schema():
+    """Create any missing database tables."""
+    Base.metadata.create_all(bind=engine)
+
+
+def _ensure_schema():
+    """Create missing tables before a command unless AUTO_CREATE_SCHEMA is disabled."""
+    if not get_bool_optional("AUTO_CREATE_SCHEMA", True):
+        return
+    init_schema()
 
 
 def generate_key(name: str = None, rate_limit: int = 1000):
     """Generate a new API key and print it."""
-    # Ensure tables exist
-    Base.metadata.create_all(bind=engine)
+    _ensure_schema()
     
     db = next(get_db())
     try:
@@ -41,7 +56,7 @@ def generate_key(name: str = None, rate_limit: int = 1000):
 
 def list_keys():
     """List all API keys."""
-    Base.metadata.create_all(bind=engine)
+    _ensure_schema()
     
     db = next(get_db())
     try:
@@ -64,7 +79,7 @@ def list_keys():
 
 def deactivate_key(key_id: int):
     """Deactivate an API key by ID."""
-    Base.metadata.create_all(bind=engine)
+    _ensure_schema()
     
     db = next(get_db())
     try:
@@ -77,10 +92,24 @@ def deactivate_key(key_id: int):
         db.close()
 
 
+def run_cleanup():
+    """Run the periodic maintenance once (for cron when BACKGROUND_CLEANUP_ENABLED=false)."""
+    from app.redis_client import RedisService
+    from app.tasks import run_maintenance
+    
+    # Rebuild the same used-codes structure the server reads (set or Bloom filter)
+    RedisService.init_code_filter()
+    asyncio.run(run_maintenance())
+    print("Maintenance complete.")
+
+
 def main():
     parser = argparse.ArgumentParser(description="API Key Management CLI")
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
     
+    # Schema init command
+    subparsers.add_parser("init", help="Create database tables")
+    
     # Generate key command
     gen_parser = subparsers.add_parser("generate", help="Generate a new API key")
     gen_parser.add_argument("--name", "-n", help="Optional name for the key")
@@ -93,14 +122,22 @@ def main():
     deact_parser = subparsers.add_parser("deactivate", help="Deactivate an API key")
     deact_parser.add_argument("id", type=int, help="ID of the key to deactivate")
     
+    # One-shot maintenance command
+    subparsers.add_parser("cleanup", help="Sync the Redis codes set and delete expired links once")
+    
     args = parser.parse_args()
     
-    if args.command == "generate":
+    if args.command == "init":
+        init_schema()
+        print("Database tables created/verified.")
+    elif args.command == "generate":
         generate_key(name=args.name, rate_limit=args.rate_limit)
     elif args.command == "list":
         list_keys()
     elif args.command == "deactivate":
         deactivate_key(args.id)
+    elif args.command == "cleanup":
+        run_cleanup()
     else:
         parser.print_help()
 
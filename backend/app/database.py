@@ -1,20 +1,37 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from .env import get_env, get_int
+from .env import get_env, get_int, get_bool_optional, get_env_optional, get_int_optional
 
-DATABASE_URL = (
-    f"mysql+pymysql://{get_env('MYSQL_USER')}:{get_env('MYSQL_PASSWORD')}"
-    f"@{get_env('MYSQL_HOST')}:{get_int('MYSQL_PORT')}/{get_env('MYSQL_DATABASE')}"
-)
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"init_command": "SET time_zone = '+00:00'"},
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_size=10,
-    max_overflow=20
-) 
+# DEV_MODE runs against a local SQLite file instead of MySQL
+DEV_MODE = get_bool_optional("DEV_MODE", False)
+
+if DEV_MODE:
+    DATABASE_URL = get_env_optional("SQLITE_URL", "sqlite:///./dev.db")
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets readers proceed while a write is in progress
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+else:
+    DATABASE_URL = (
+        f"mysql+pymysql://{get_env('MYSQL_USER')}:{get_env('MYSQL_PASSWORD')}"
+        f"@{get_env('MYSQL_HOST')}:{get_int('MYSQL_PORT')}/{get_env('MYSQL_DATABASE')}"
+    )
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"init_command": "SET time_zone = '+00:00'"},
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_size=get_int_optional("DB_POOL_SIZE", 10),
+        max_overflow=get_int_optional("DB_MAX_OVERFLOW", 20)
+    )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -1,27 +1,42 @@
 import os
 import json
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
 
+# Parsed backend/.env contents, cached so reloads don't re-read the file
+_env_file_values: dict[str, str] | None = None
+
+
+def _parse_env_file(env_path: Path) -> dict[str, str]:
+    """Parse KEY=VALUE lines, skipping blanks, comments and malformed lines."""
+    values: dict[str, str] = {}
+    text = env_path.read_bytes().decode("utf-8", "replace")
+    for line in text.splitlines():
+        key, sep, value = line.partition("=")
+        if not sep:
+            continue
+        key = key.strip()
+        if not key or key.startswith("#"):
+            continue
+        values[key] = value.strip().strip("\"'")
+    return values
+
+
 def _load_env_file() -> None:
     """Load key/value pairs from backend/.env into os.environ if missing."""
-    env_path = Path(__file__).resolve().parents[1] / ".env"
-    if not env_path.exists():
-        return
+    global _env_file_values
+    if _env_file_values is None:
+        env_path = Path(__file__).resolve().parents[1] / ".env"
+        try:
+            _env_file_values = _parse_env_file(env_path)
+        except Exception:
+            # Missing/unreadable file: required keys will be validated on access.
+            _env_file_values = {}
 
-    try:
-        for line in env_path.read_text(encoding="utf-8").splitlines():
-            line = line.strip()
-            if not line or line.startswith("#") or "=" not in line:
-                continue
-            key, value = line.split("=", 1)
-            key = key.strip()
-            value = value.strip().strip('"').strip("'")
-            os.environ.setdefault(key, value)
-    except Exception:
-        # Fail silently; required keys will be validated on access.
-        return
+    for key, value in _env_file_values.items():
+        os.environ.setdefault(key, value)
 
 
 _load_env_file()
@@ -51,15 +66,21 @@ def get_bool(key: str) -> bool:
     raise RuntimeError(f"Invalid bool for env var {key}: {val}")
 
 
-def get_json_list(key: str) -> list[str]:
-    raw = get_env(key)
+@lru_cache(maxsize=32)
+def _parse_json_list(key: str, raw: str) -> tuple[str, ...]:
+    """Parse a JSON array once per distinct raw value."""
     try:
         data = json.loads(raw)
     except Exception as exc:
         raise RuntimeError(f"Invalid JSON for env var {key}: {raw}") from exc
     if not isinstance(data, list):
         raise RuntimeError(f"Expected JSON array for env var {key}: {raw}")
-    return [str(item) for item in data]
+    return tuple(str(item) for item in data)
+
+
+def get_json_list(key: str) -> list[str]:
+    # Cached on the raw string, so a changed env value is re-parsed
+    return list(_parse_json_list(key, get_env(key)))
 
 
 def get_env_optional(key: str, default: str = "") -> str:
@@ -4,8 +4,8 @@ Provides structured JSON logging with request IDs for tracing.
 """
 
 import logging
+import secrets
 import sys
-import uuid
 from contextvars import ContextVar
 from typing import Optional
 
@@ -22,17 +22,20 @@ def get_request_id() -> Optional[str]:
 
 def set_request_id(request_id: Optional[str] = None) -> str:
     """Set a request ID in context. Generates one if not provided."""
-    rid = request_id or str(uuid.uuid4())[:8]
+    rid = request_id or secrets.token_hex(4)
     request_id_var.set(rid)
     return rid
 
 
-class RequestIdFilter(logging.Filter):
-    """Logging filter that adds request_id to log records."""
-    
-    def filter(self, record: logging.LogRecord) -> bool:
-        record.request_id = get_request_id() or "-"
-        return True
+# Factory in place before we wrap it (kept so setup_logging stays idempotent)
+_base_record_factory = logging.getLogRecordFactory()
+
+
+def _record_factory(*args, **kwargs) -> logging.LogRecord:
+    """Create log records with request_id set once at construction."""
+    record = _base_record_factory(*args, **kwargs)
+    record.request_id = request_id_var.get() or "-"
+    return record
 
 
 def setup_logging() -> None:
@@ -61,7 +64,9 @@ def setup_logging() -> None:
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(log_level)
     console_handler.setFormatter(logging.Formatter(log_format, date_format))
-    console_handler.addFilter(RequestIdFilter())
+    
+    # Stamp request_id on every record (instead of a per-handler filter)
+    logging.setLogRecordFactory(_record_factory)
     
     root_logger.addHandler(console_handler)
     
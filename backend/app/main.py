@@ -1,22 +1,31 @@
+import asyncio
+import logging
+import time
+from typing import Optional
 from fastapi import FastAPI, Request, Depends
-from fastapi.responses import RedirectResponse, JSONResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse, JSONResponse, HTMLResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+from sqlalchemy import func, or_, select, text
 from sqlalchemy.orm import Session
 from pathlib import Path
+from starlette.convertors import Convertor, register_url_convertor
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
 
-from .env import get_env, get_bool, get_list, get_bool_optional
+from .env import get_env, get_bool, get_list, get_bool_optional, get_int_optional
 from .database import engine, Base, get_db
 from .routes import router as api_router, get_client_ip
 from .services import LinkService
 from .redis_client import RedisService, redis_client
 from .models import Link
-from .utils import utc_now, normalize_utc
+from .schemas import HealthResponse
+from .utils import utc_now, get_reserved_codes
 from .logging_config import setup_logging, get_logger, set_request_id, get_request_id
-from .tasks import task_runner
+from .tasks import task_runner, refresh_api_key_filter
+from .captcha import close_http_client, warm_up_http_client
 
 # Initialize structured logging
 setup_logging()
@@ -25,6 +34,43 @@ logger = get_logger(__name__)
 PUBLIC_DIR = Path(__file__).resolve().parents[2] / "frontend" / "public"
 
 
+def _load_public_file(name: str) -> Optional[bytes]:
+    """Read a file from the public directory once, if present."""
+    try:
+        return (PUBLIC_DIR / name).read_bytes()
+    except OSError:
+        return None
+
+
+# Error pages and favicon are served from memory so 404/410 floods don't
+# stat+open the file on every request (restart to pick up frontend edits)
+_EXPIRED_HTML = _load_public_file("expired.html")
+_NOT_FOUND_HTML = _load_public_file("404.html")
+_FAVICON = _load_public_file("favicon.ico")
+
+
+def _wants_html(request: Request) -> bool:
+    """Whether the client asked for HTML (only consulted on error responses)."""
+    return "text/html" in request.headers.get("accept", "")
+
+
+class ShortCodeConvertor(Convertor):
+    """Path convertor matching only strings that could be a short code."""
+    
+    regex = "[A-Za-z0-9-]{1,64}"
+    
+    def convert(self, value: str) -> str:
+        return value
+    
+    def to_string(self, value: str) -> str:
+        return value
+
+
+# Paths that can't be a code (dots, underscores, too long) never match the
+# catch-all route, so bot probes 404 without reaching the redirect handler
+register_url_convertor("shortcode", ShortCodeConvertor())
+
+
 class RequestIdMiddleware(BaseHTTPMiddleware):
     """Middleware to add request ID to each request for tracing."""
     
@@ -41,6 +87,14 @@ class RequestIdMiddleware(BaseHTTPMiddleware):
         return response
 
 
+# Load balancer probes within this window reuse the last /health result
+HEALTH_CACHE_SECONDS = get_int_optional("HEALTH_CACHE_SECONDS", 5)
+_health_cache: Optional[tuple[float, bool, bool]] = None
+
+# Links queued per Redis pipeline round trip during startup cache warm-up
+WARMUP_BATCH_SIZE = 1000
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler."""
@@ -51,6 +105,9 @@ async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables created/verified")
     
+    # Load active API key hashes so unknown keys are rejected without a DB hit
+    refresh_api_key_filter()
+    
     # Rebuild Redis cache from the database (flush then load all entries)
     try:
         db = next(get_db())
@@ -62,43 +119,87 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"Failed to flush Redis: {e}")
 
+        # Track used codes in a Bloom filter when RedisBloom is loaded
+        if RedisService.init_code_filter():
+            logger.info("Using RedisBloom filter for used codes")
+        
+        # Misses in the used codes are trusted once every DB code is loaded;
+        # until then (and if another worker flushes meanwhile) they hit the DB
+        rebuild_token = RedisService.begin_codes_rebuild()
+
         now = utc_now()
 
-        # Count expired links (do NOT delete — keep suffixes reserved)
-        try:
-            expired_count = db.query(Link).filter(Link.expires_at != None).filter(Link.expires_at < now).count()
-        except Exception:
-            expired_count = 0
+        # Count expired links (do NOT delete — keep suffixes reserved).
+        # Only used for the startup log line, so skip the query when it won't be shown.
+        expired_count = 0
+        if logger.isEnabledFor(logging.INFO):
+            try:
+                expired_count = db.scalar(
+                    select(func.count()).select_from(Link).where(Link.expires_at < now)
+                ) or 0
+            except Exception:
+                expired_count = 0
 
         loaded = 0
+        pending = 0
         skipped = 0
-        links = db.query(Link).all()
-        for link in links:
+        # Codes go into the used-codes set one multi-member SADD per batch
+        batch_codes: list[str] = []
+        # Queue writes on an untransacted pipeline instead of two round trips per link
+        pipe = redis_client.pipeline(transaction=False)
+        # Stream only the needed columns; expired links are skipped in SQL
+        # (their DB rows are kept so suffixes remain reserved)
+        rows = db.execute(
+            select(Link.suffix, Link.destination, Link.expires_at, Link.password_hash.is_not(None))
+            .where(or_(Link.expires_at.is_(None), Link.expires_at >= now))
+            .execution_options(yield_per=WARMUP_BATCH_SIZE)
+        )
+        for code, url, expires_at_val, protected in rows:
             try:
-                code = getattr(link, "suffix", None)
-                url = getattr(link, "destination", None)
-                expires_at_val = normalize_utc(getattr(link, "expires_at", None))
-
-                # Skip expired links (keep DB rows so suffixes remain reserved)
-                if expires_at_val and expires_at_val < now:
-                    skipped += 1
-                    continue
-
                 # Cache non-expired entries in Redis with TTL matching DB expiry (or persist if none)
                 if url and code:
-                    RedisService.cache_link(code, url, expires_at=expires_at_val)
-                    RedisService.add_code_to_set(code)
+                    # cache_link treats naive values as UTC, so no per-row normalize_utc
+                    RedisService.cache_link(
+                        code, url, expires_at=expires_at_val, pipe=pipe, now=now, protected=protected
+                    )
+                    batch_codes.append(code)
                     loaded += 1
+                    pending += 1
+                    if pending >= WARMUP_BATCH_SIZE:
+                        RedisService.add_codes_to_set(batch_codes, pipe=pipe)
+                        pipe.execute()
+                        pending = 0
+                        batch_codes = []
             except Exception:
-                # Skip problematic rows
+                # Skip problematic rows (the used codes then stay incomplete)
+                skipped += 1
                 continue
+        # Expired rows keep their suffixes reserved, so their codes still go
+        # into the used-codes set (code_status reads them from there)
+        expired_codes = db.execute(
+            select(Link.suffix)
+            .where(Link.expires_at < now)
+            .execution_options(yield_per=WARMUP_BATCH_SIZE)
+        )
+        for code in expired_codes.scalars():
+            if code:
+                batch_codes.append(code)
+                pending += 1
+                if pending >= WARMUP_BATCH_SIZE:
+                    RedisService.add_codes_to_set(batch_codes, pipe=pipe)
+                    pipe.execute()
+                    pending = 0
+                    batch_codes = []
+        if pending:
+            RedisService.add_codes_to_set(batch_codes, pipe=pipe)
+            pipe.execute()
+        if rebuild_token and not skipped:
+            RedisService.mark_codes_complete(rebuild_token)
 
         db.commit()
         logger.info(f"Loaded {loaded} link entries into Redis")
         if expired_count:
             logger.info(f"Found {expired_count} expired link rows in DB; skipped caching to keep suffixes reserved")
-        if skipped:
-            logger.info(f"Skipped caching {skipped} expired links during startup")
         db.close()
     except Exception as e:
         logger.error(f"Failed to rebuild Redis cache from DB: {e}")
@@ -106,10 +207,15 @@ async def lifespan(app: FastAPI):
     # Start background cleanup tasks
     task_runner.start()
     
+    # Warm the Turnstile connection without delaying startup
+    warm_up_task = asyncio.create_task(warm_up_http_client())
+    
     yield
     
     # Shutdown
+    warm_up_task.cancel()
     task_runner.stop()
+    await close_http_client()
     logger.info("Shutting down Link Shortener API...")
 
 
@@ -132,27 +238,25 @@ if PUBLIC_DIR.exists():
 # Static HTML pages
 @app.get("/expired.html", include_in_schema=False)
 async def expired_page():
-    page = PUBLIC_DIR / "expired.html"
-    if page.exists():
-        return FileResponse(page, status_code=410)
+    if _EXPIRED_HTML is not None:
+        return HTMLResponse(_EXPIRED_HTML, status_code=410)
     return JSONResponse(status_code=404, content={"error": "Not found"})
 
 
 @app.get("/404.html", include_in_schema=False)
 async def not_found_page():
-    page = PUBLIC_DIR / "404.html"
-    if page.exists():
-        return FileResponse(page, status_code=404)
+    if _NOT_FOUND_HTML is not None:
+        return HTMLResponse(_NOT_FOUND_HTML, status_code=404)
     return JSONResponse(status_code=404, content={"error": "Not found"})
 
 
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
-    icon = PUBLIC_DIR / "favicon.ico"
-    if icon.exists():
-        return FileResponse(icon)
+    if _FAVICON is not None:
+        return Response(_FAVICON, media_type="image/x-icon")
     return JSONResponse(status_code=404, content={"error": "Not found"})
 
+
 # Request ID middleware for tracing
 app.add_middleware(RequestIdMiddleware)
 
@@ -173,20 +277,33 @@ app.add_middleware(
 app.include_router(api_router, prefix="/api", tags=["API"])
 
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint."""
+def _probe_health() -> tuple[bool, bool]:
+    """Check database and Redis connectivity (blocking)."""
     db_healthy = True
     redis_healthy = RedisService.health_check()
     
     try:
-        from sqlalchemy import text
         db = next(get_db())
         db.execute(text("SELECT 1"))
         db.close()
     except Exception:
         db_healthy = False
     
+    return db_healthy, redis_healthy
+
+
+@app.get("/health", response_model=HealthResponse)
+async def health_check():
+    """Health check endpoint. Probe results are reused for HEALTH_CACHE_SECONDS."""
+    global _health_cache
+    now = time.monotonic()
+    cached = _health_cache
+    if cached is not None and now - cached[0] < HEALTH_CACHE_SECONDS:
+        db_healthy, redis_healthy = cached[1], cached[2]
+    else:
+        db_healthy, redis_healthy = await run_in_threadpool(_probe_health)
+        _health_cache = (now, db_healthy, redis_healthy)
+    
     status = "healthy" if (db_healthy and redis_healthy) else "degraded"
     
     return {
@@ -197,38 +314,31 @@ async def health_check():
     }
 
 
-@app.get("/{code}")
+@app.get("/{code:shortcode}")
 async def redirect_to_url(
     code: str,
     request: Request,
     db: Session = Depends(get_db)
 ):
     """Redirect short code to original URL."""
-    # Skip static files and API routes
-    if code in ["favicon.ico", "robots.txt", "sitemap.xml"]:
-        return JSONResponse(status_code=404, content={"detail": "Not found"})
-    
     code_lower = code.lower()
     
+    # Skip static files and API routes (reserved codes never resolve to a link)
+    if code_lower in get_reserved_codes():
+        return JSONResponse(status_code=404, content={"detail": "Not found"})
+    
     # Resolve URL (cache first, then DB). get_original_url returns (url, expired)
-    accept = request.headers.get("accept", "")
-
-    url, expired = LinkService.get_original_url(db, code_lower)
+    # Cache/DB lookup is blocking I/O; keep it off the event loop
+    url, expired = await run_in_threadpool(LinkService.get_original_url, db, code_lower)
 
     if not url:
         if expired:
-            if "text/html" in accept:
-                page = PUBLIC_DIR / "expired.html"
-                if page.exists():
-                    return FileResponse(page, status_code=410)
-                return JSONResponse(status_code=410, content={"error": "Link expired"})
+            if _EXPIRED_HTML is not None and _wants_html(request):
+                return HTMLResponse(_EXPIRED_HTML, status_code=410)
             return JSONResponse(status_code=410, content={"error": "Link expired"})
         # not found
-        if "text/html" in accept:
-            page = PUBLIC_DIR / "404.html"
-            if page.exists():
-                return FileResponse(page, status_code=404)
-            return JSONResponse(status_code=404, content={"error": "Link not found"})
+        if _NOT_FOUND_HTML is not None and _wants_html(request):
+            return HTMLResponse(_NOT_FOUND_HTML, status_code=404)
         return JSONResponse(status_code=404, content={"error": "Link not found"})
     
     # Click recording removed per user's request
@@ -242,11 +352,8 @@ async def redirect_to_url(
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     # Handle 404 specially, otherwise return JSON using the exception's status code
     if getattr(exc, "status_code", None) == 404:
-        accept = request.headers.get("accept", "")
-        if "text/html" in accept:
-            page = PUBLIC_DIR / "404.html"
-            if page.exists():
-                return FileResponse(page, status_code=404)
+        if _NOT_FOUND_HTML is not None and _wants_html(request):
+            return HTMLResponse(_NOT_FOUND_HTML, status_code=404)
         return JSONResponse(status_code=404, content={"error": "Not found"})
     return JSONResponse(status_code=exc.status_code or 500, content={"detail": exc.detail or "HTTP error"})
 
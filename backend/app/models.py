@@ -17,7 +17,7 @@ class Link(Base):
     ip_address = Column(String(45), nullable=True)  # IPv6 max length is 45 chars
     
     # Password protection
-    password_hash = Column(String(64), nullable=True)
+    password_hash = Column(String(255), nullable=True)  # Argon2id PHC string
     
     # One-time/click-limited links
     max_clicks = Column(Integer, nullable=True)  # None = unlimited
@@ -28,8 +28,8 @@ class Link(Base):
     og_description = Column(Text, nullable=True)
     og_image = Column(String(500), nullable=True)
     
+    # suffix is already covered by the unique index from unique=True/index=True
     __table_args__ = (
-        Index('idx_suffix', 'suffix'),
         Index('idx_expires_at', 'expires_at'),
         Index('idx_created_at', 'created_at'),
     )
@@ -51,9 +51,7 @@ class ApiKey(Base):
     rate_limit = Column(Integer, default=1000)  # Requests per hour
     is_active = Column(Boolean, default=True, nullable=False)
     
-    __table_args__ = (
-        Index('idx_key_hash', 'key_hash'),
-    )
+    # key_hash lookups are point reads on the unique index from unique=True
     
     def __repr__(self):
         return f"<ApiKey(name={self.name}, active={self.is_active})>"
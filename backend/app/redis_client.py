@@ -1,8 +1,19 @@
+import secrets
+import threading
+import time
+
+import orjson
 import redis
-from redis.exceptions import RedisError, ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from redis.client import Pipeline
+from redis.exceptions import (
+    RedisError,
+    ResponseError,
+    ConnectionError as RedisConnectionError,
+    TimeoutError as RedisTimeoutError,
+)
 from typing import Optional, Any, cast
 from datetime import datetime, timezone
-from .env import get_env, get_int
+from .env import get_env, get_int, get_bool_optional, get_env_optional, get_int_optional
 from .logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -12,13 +23,28 @@ USE_REDIS = True
 
 # Redis connection pool
 try:
-    pool = redis.ConnectionPool(
-        host=get_env("REDIS_HOST"),
-        port=get_int("REDIS_PORT"),
+    # Prefer a Unix domain socket when Redis runs on the same host; it skips
+    # the loopback TCP stack on every command
+    unix_socket_path = get_env_optional("REDIS_UNIX_SOCKET")
+    if unix_socket_path:
+        address: dict[str, Any] = {
+            "connection_class": redis.UnixDomainSocketConnection,
+            "path": unix_socket_path,
+        }
+    else:
+        address = {"host": get_env("REDIS_HOST"), "port": get_int("REDIS_PORT")}
+    
+    # Blocking pool: handlers call Redis from the threadpool, so bursts wait
+    # briefly for a free connection instead of failing with "Too many connections"
+    pool = redis.BlockingConnectionPool(
+        **address,
         db=get_int("REDIS_DB"),
         password=get_env("REDIS_PASSWORD") or None,
-        decode_responses=True,
-        max_connections=20,
+        # Replies stay as bytes; callers decode only what they use (URLs are
+        # decoded once per local-cache miss in LinkService)
+        decode_responses=False,
+        max_connections=get_int_optional("REDIS_MAX_CONNECTIONS", 40),
+        timeout=5,
         socket_connect_timeout=5,
         socket_timeout=5,
         retry_on_timeout=True
@@ -28,45 +54,132 @@ except RedisError as e:
     logger.error(f"Failed to create Redis connection pool: {e}")
     raise 
 
+# Sliding-window approximation over two fixed buckets: count this bucket's
+# hit and add the previous bucket's count weighted by how much of it still
+# overlaps the window. Buckets expire on their own after two windows.
+# ARGV: window length (ms), elapsed time in the current bucket (ms).
+# redis-py runs this via EVALSHA and loads it on NOSCRIPT.
+_RATE_LIMIT_LUA = """
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[1] * 2)
+end
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local window = tonumber(ARGV[1])
+return current + math.floor(previous * (window - tonumber(ARGV[2])) / window)
+"""
+_rate_limit_script = redis_client.register_script(_RATE_LIMIT_LUA)
+
+# Finish a full rebuild of the used codes: KEYS = marker, rebuilt key (or ""
+# for a rebuild in place), live key, recent codes, guard. A FLUSHDB since
+# begin_codes_rebuild() took the marker with it, so the rebuild is discarded.
+# Otherwise codes flushed since the rebuild began (less ARGV[2] seconds of
+# clock skew) are added, the rebuilt key is swapped in and the guard is set.
+_CODES_REBUILD_LUA = """
+local since = redis.call('GET', KEYS[1])
+if not since then
+    if KEYS[2] ~= '' then
+        redis.call('DEL', KEYS[2])
+    end
+    return 0
+end
+if KEYS[2] ~= '' then
+    local recent = redis.call('ZRANGEBYSCORE', KEYS[4], tonumber(since) - tonumber(ARGV[2]), '+inf')
+    local cmd = ARGV[1] == '1' and 'BF.MADD' or 'SADD'
+    for i = 1, #recent, 1000 do
+        redis.call(cmd, KEYS[2], unpack(recent, i, math.min(i + 999, #recent)))
+    end
+    if redis.call('EXISTS', KEYS[2]) == 1 then
+        redis.call('RENAME', KEYS[2], KEYS[3])
+        redis.call('PERSIST', KEYS[3])
+    else
+        redis.call('DEL', KEYS[3])
+    end
+end
+redis.call('SET', KEYS[5], '1')
+redis.call('DEL', KEYS[1])
+return 1
+"""
+_codes_rebuild_script = redis_client.register_script(_CODES_REBUILD_LUA)
+
+# Newly created codes waiting to be SADDed to CODES_SET in one batch by the
+# background task runner. Collision checks consult this buffer too.
+_pending_codes: set[str] = set()
+_pending_codes_lock = threading.Lock()
+
+# True once init_code_filter() finds RedisBloom; used codes then live in a
+# Bloom filter (CODES_BLOOM) instead of the CODES_SET set
+_use_bloom = False
+
 
 class RedisService:
     """Redis service for caching and rate limiting."""
     
     LINK_CACHE_PREFIX = "link:"
     CODES_SET = "codes:used"
+    CODES_BLOOM = "codes:bf"
+    # Set once a full warm-up or sync has loaded every DB code; only then is
+    # a miss in the used codes proof that a code is unused
+    CODES_COMPLETE = "codes:complete"
+    # Sorted set of recently flushed codes (scored by time) for rebuild swaps
+    CODES_RECENT = "codes:recent"
     RATE_LIMIT_PREFIX = "ratelimit:ip:"
+    API_KEY_PREFIX = "apikey:"
     
     CACHE_TTL = 86400  # 24 hours
-    RATE_LIMIT_TTL = 3600  # 1 hour
+    RATE_LIMIT_TTL = 3600  # 1 hour window
+    API_KEY_CACHE_TTL = 300  # 5 minutes
+    CODES_SYNC_CHUNK = 5000  # members per SADD when rebuilding CODES_SET
+    PENDING_CODES_MAX = 10000  # buffered codes that trigger an inline flush
+    CODES_RECENT_WINDOW = 3600  # seconds CODES_RECENT and rebuild markers live
+    CODES_CLOCK_SKEW = 60  # seconds of worker clock drift tolerated by rebuilds
+    BLOOM_ERROR_RATE = 0.0001
+    BLOOM_CAPACITY = get_int_optional("CODES_BLOOM_CAPACITY", 1_000_000)  # grows past this
+    # Leads the cached URL of password-protected links (URLs never start with NUL)
+    PROTECTED_MARK = "\x00"
     
     @staticmethod
-    def cache_link(code: str, url: str, expires_at: Optional[datetime] = None) -> bool:
-        """Cache a short code to URL mapping."""
+    def cache_link(
+        code: str,
+        url: str,
+        expires_at: Optional[datetime] = None,
+        pipe: Optional[Pipeline] = None,
+        now: Optional[datetime] = None,
+        protected: bool = False,
+    ) -> bool:
+        """
+        Cache a short code to URL mapping.
+        Password-protected links are stored behind PROTECTED_MARK, so readers
+        learn the flag from the same GET.
+        When ``pipe`` is given the commands are queued on it and the caller
+        is responsible for executing the pipeline. Bulk callers can pass a
+        fixed aware ``now`` to avoid reading the clock per link.
+        """
         if not USE_REDIS:
             return False
+        client = pipe if pipe is not None else redis_client
+        if protected:
+            url = RedisService.PROTECTED_MARK + url
         try:
-            # Store as a hash; TTL on the key enforces expiry
-            key = f"{RedisService.LINK_CACHE_PREFIX}{code}"
-            mapping: dict[str, str] = {"url": url}
-            redis_client.hset(key, mapping=mapping)
+            # Store as a plain string; TTL on the key enforces expiry
+            key = _LINK_PREFIX + code
             
-            # Set TTL on the hash to match DB expiry if provided
+            # Set TTL to match DB expiry if provided
             if expires_at:
-                now = datetime.now(timezone.utc)
+                if now is None:
+                    now = datetime.now(timezone.utc)
                 # Normalize naive datetime
                 if getattr(expires_at, "tzinfo", None) is None:
                     expires_at = expires_at.replace(tzinfo=timezone.utc)
                 delta = (expires_at - now).total_seconds()
-                if delta > 0:
-                    ttl = int(min(delta, RedisService.CACHE_TTL))
-                    redis_client.expire(key, ttl)
-                else:
+                if delta <= 0:
                     # Already expired: don't cache
-                    redis_client.delete(key)
+                    client.delete(key)
                     return False
+                client.set(key, url, ex=max(1, int(min(delta, RedisService.CACHE_TTL))))
             else:
-                # No DB expiry -> keep persistent in Redis
-                redis_client.persist(key)
+                # No DB expiry -> keep persistent in Redis (SET clears any old TTL)
+                client.set(key, url)
             return True
         except (RedisConnectionError, RedisTimeoutError) as e:
             logger.warning(f"Redis connection error caching link {code}: {e}")
@@ -76,70 +189,256 @@ class RedisService:
             return False
     
     @staticmethod
-    def get_cached_link(code: str) -> Optional[str]:
-        """Get cached URL for a short code."""
-        if not USE_REDIS:
-            return None
+    def cache_links(entries: list[tuple[str, str, Optional[datetime]]]) -> bool:
+        """Cache several (code, url, expires_at) mappings in one round trip."""
+        if not USE_REDIS or not entries:
+            return False
+        now = datetime.now(timezone.utc)
         try:
-            key = f"{RedisService.LINK_CACHE_PREFIX}{code}"
-            data = cast(dict[str, str], redis_client.hgetall(key))
-            if not data:
-                return None
-            url = data.get("url")
-            return cast(Optional[str], url)
-        except (RedisConnectionError, RedisTimeoutError) as e:
-            logger.warning(f"Redis connection error getting link {code}: {e}")
-            return None
+            pipe = redis_client.pipeline(transaction=False)
+            for code, url, expires_at in entries:
+                RedisService.cache_link(code, url, expires_at=expires_at, pipe=pipe, now=now)
+            pipe.execute()
+            return True
         except RedisError as e:
-            logger.error(f"Redis error getting link {code}: {e}")
-            return None
+            logger.error(f"Redis error caching {len(entries)} links: {e}")
+            return False
     
     @staticmethod
-    def delete_cached_link(code: str) -> bool:
-        """Delete cached link."""
+    def lookup_link(code: str) -> tuple[Optional[bytes], Optional[float], Optional[bool]]:
+        """
+        Cached URL, its remaining TTL and code_status in one round trip.
+        Returns (url, ttl, code_status); code_status is only computed for a
+        cache miss and is False only under the CODES_COMPLETE guard, letting
+        callers skip the DB for codes that were never used.
+        """
         if not USE_REDIS:
+            return None, None, None
+        try:
+            key = _LINK_PREFIX + code
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.pttl(key)
+            RedisService._queue_code_lookup(pipe, code)
+            url, pttl, key_exists, member = pipe.execute(raise_on_error=False)
+        except RedisError as e:
+            logger.warning(f"Redis error looking up link {code}: {e}")
+            return None, None, None
+        if url and not isinstance(url, Exception):
+            ttl = pttl / 1000 if isinstance(pttl, int) and pttl >= 0 else None
+            return cast(bytes, url), ttl, True
+        if isinstance(url, Exception):
+            logger.error(f"Redis error getting link {code}: {url}")
+        status = RedisService._code_lookup_result(key_exists, member)
+        return None, None, True if code in _pending_codes else status
+    
+    @staticmethod
+    def init_code_filter() -> bool:
+        """
+        Probe for RedisBloom and reserve the used-codes Bloom filter.
+        Falls back to the CODES_SET set when the module isn't loaded or
+        CODES_BLOOM_ENABLED is false. Returns True if the Bloom filter is used.
+        """
+        global _use_bloom
+        _use_bloom = False
+        if not USE_REDIS or not get_bool_optional("CODES_BLOOM_ENABLED", True):
             return False
         try:
-            redis_client.delete(f"{RedisService.LINK_CACHE_PREFIX}{code}")
+            RedisService._reserve_bloom(redis_client, RedisService.CODES_BLOOM)
+            _use_bloom = True
+        except ResponseError as e:
+            if "exists" in str(e).lower():
+                _use_bloom = True
+            else:
+                logger.info(f"RedisBloom unavailable, using a set for used codes: {e}")
+        except RedisError as e:
+            logger.error(f"Redis error initializing code filter: {e}")
+        return _use_bloom
+    
+    @staticmethod
+    def _reserve_bloom(client: Any, key: str) -> None:
+        """Create an empty scalable Bloom filter at ``key``."""
+        client.execute_command(
+            "BF.RESERVE", key, RedisService.BLOOM_ERROR_RATE, RedisService.BLOOM_CAPACITY
+        )
+    
+    @staticmethod
+    def code_filter_exact() -> bool:
+        """
+        Whether code_status() positives are exact. False with the Bloom filter,
+        whose positives may be false or belong to since-deleted links.
+        """
+        return not _use_bloom
+    
+    @staticmethod
+    def forget_links(codes: list[str], release_codes: bool = True) -> bool:
+        """
+        Drop cached URLs and used-code entries for many codes at once:
+        one DEL and one SREM per chunk, all in a single pipelined round trip.
+        Pass release_codes=False for expired links whose DB rows are kept, so
+        their codes stay reserved in the used-codes set.
+        """
+        if not USE_REDIS or not codes:
+            return True
+        if release_codes:
+            with _pending_codes_lock:
+                _pending_codes.difference_update(codes)
+        size = RedisService.CODES_SYNC_CHUNK
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for i in range(0, len(codes), size):
+                chunk = codes[i:i + size]
+                pipe.delete(*[_LINK_PREFIX + code for code in chunk])
+                # Bloom filters can't delete; the periodic sync rebuilds from the DB
+                if release_codes and not _use_bloom:
+                    pipe.srem(RedisService.CODES_SET, *chunk)
+                    pipe.zrem(RedisService.CODES_RECENT, *chunk)
+            pipe.execute()
             return True
         except RedisError as e:
-            logger.error(f"Redis error deleting link {code}: {e}")
+            logger.error(f"Redis error forgetting {len(codes)} links: {e}")
             return False
     
     @staticmethod
-    def add_code_to_set(code: str) -> bool:
-        """Add a code to the set of used codes."""
-        if not USE_REDIS:
+    def add_codes_to_set(codes: list[str], pipe: Optional[Pipeline] = None) -> bool:
+        """
+        Add many codes to the set of used codes, one SADD (or BF.MADD) per
+        CODES_SYNC_CHUNK members; queued on ``pipe`` if given.
+        """
+        if not USE_REDIS or not codes:
             return True
+        client = pipe if pipe is not None else redis_client.pipeline(transaction=False)
+        size = RedisService.CODES_SYNC_CHUNK
         try:
-            redis_client.sadd(RedisService.CODES_SET, code)
+            for i in range(0, len(codes), size):
+                if _use_bloom:
+                    client.execute_command("BF.MADD", RedisService.CODES_BLOOM, *codes[i:i + size])
+                else:
+                    client.sadd(RedisService.CODES_SET, *codes[i:i + size])
+            if pipe is None:
+                client.execute()
             return True
         except RedisError as e:
-            logger.error(f"Redis error adding code to set {code}: {e}")
+            logger.error(f"Redis error adding {len(codes)} codes to set: {e}")
             return False
     
     @staticmethod
-    def code_exists(code: str) -> bool:
-        """Check if a code exists in the set."""
+    def queue_code(code: str) -> None:
+        """
+        Buffer a new code for the next batched SADD (see flush_pending_codes).
+        The DB unique constraint stays authoritative, so the short delay before
+        other workers see the code only risks a retried insert.
+        """
         if not USE_REDIS:
-            return False
+            return
+        with _pending_codes_lock:
+            _pending_codes.add(code)
+            overflow = len(_pending_codes) >= RedisService.PENDING_CODES_MAX
+        if overflow:
+            # The runner is behind (or Redis is failing): write now rather than grow
+            logger.warning(
+                f"Pending codes buffer reached {RedisService.PENDING_CODES_MAX}; flushing inline"
+            )
+            RedisService.flush_pending_codes()
+    
+    @staticmethod
+    def flush_pending_codes() -> int:
+        """Write buffered codes to CODES_SET in one round trip. Returns count written."""
+        global _pending_codes
+        with _pending_codes_lock:
+            if not _pending_codes:
+                return 0
+            pending, _pending_codes = _pending_codes, set()
+        
+        codes = list(pending)
+        now = time.time()
+        size = RedisService.CODES_SYNC_CHUNK
         try:
-            return bool(redis_client.sismember(RedisService.CODES_SET, code))
+            pipe = redis_client.pipeline(transaction=False)
+            RedisService.add_codes_to_set(codes, pipe=pipe)
+            # A rebuild that began before these codes were committed adds them
+            # back from CODES_RECENT when it swaps its copy in
+            for i in range(0, len(codes), size):
+                pipe.zadd(RedisService.CODES_RECENT, dict.fromkeys(codes[i:i + size], now))
+            pipe.zremrangebyscore(
+                RedisService.CODES_RECENT, "-inf", now - RedisService.CODES_RECENT_WINDOW
+            )
+            pipe.expire(RedisService.CODES_RECENT, RedisService.CODES_RECENT_WINDOW)
+            pipe.execute()
+            return len(codes)
         except RedisError as e:
-            logger.warning(f"Redis error checking code existence {code}: {e}")
-            return False
+            logger.warning(f"Redis error flushing {len(codes)} pending codes: {e}")
+        # Keep every code for the next flush; dropping one would let another
+        # worker hand out a code that is already taken
+        with _pending_codes_lock:
+            _pending_codes.update(codes)
+        return 0
     
     @staticmethod
-    def remove_code_from_set(code: str) -> bool:
-        """Remove a code from the set."""
+    def _queue_code_lookup(pipe: Pipeline, code: str) -> None:
+        """Queue the used-codes key and guard checks and the membership test for code_status."""
+        key = RedisService.CODES_BLOOM if _use_bloom else RedisService.CODES_SET
+        pipe.exists(key, RedisService.CODES_COMPLETE)
+        if _use_bloom:
+            pipe.execute_command("BF.EXISTS", key, code)
+        else:
+            pipe.sismember(key, code)
+    
+    @staticmethod
+    def _code_lookup_result(key_exists: Any, member: Any) -> Optional[bool]:
+        """Interpret the replies queued by _queue_code_lookup."""
+        for reply in (key_exists, member):
+            if isinstance(reply, Exception):
+                logger.warning(f"Redis error checking code existence: {reply}")
+                return None
+        if member:
+            return True
+        if key_exists != 2:
+            # Lost, or not fully rebuilt yet (e.g. warm-up still loading after
+            # a restart): a miss can't rule anything out
+            return None
+        return False
+    
+    @staticmethod
+    def code_status(code: str) -> Optional[bool]:
+        """
+        Look a code up in the link cache and the used-codes set or Bloom filter.
+        Returns True when the code is (or, with a Bloom filter, may be) used,
+        None when Redis can't answer, and False when Redis has no record of it
+        and CODES_COMPLETE says every DB code was loaded. False is still
+        advisory for /check: a link created on another worker moments ago
+        may not be cached yet, so the DB unique index decides at create time.
+        """
         if not USE_REDIS:
+            return None
+        if code in _pending_codes:
             return True
         try:
-            redis_client.srem(RedisService.CODES_SET, code)
-            return True
+            pipe = redis_client.pipeline(transaction=False)
+            # New links are cached at once, ahead of the batched code flush
+            pipe.exists(_LINK_PREFIX + code)
+            RedisService._queue_code_lookup(pipe, code)
+            cached, key_exists, member = pipe.execute(raise_on_error=False)
         except RedisError as e:
-            logger.error(f"Redis error removing code from set {code}: {e}")
-            return False
+            logger.warning(f"Redis error checking code existence {code}: {e}")
+            return None
+        if cached and not isinstance(cached, Exception):
+            return True
+        status = RedisService._code_lookup_result(key_exists, member)
+        # A code created by this worker may have been flushed meanwhile
+        return True if code in _pending_codes else status
+    
+    @staticmethod
+    def _rate_limit_hit(ip: str, client: Optional[Any] = None) -> Any:
+        """Record a hit for ip and return its sliding-window count (queued when client is a pipeline)."""
+        window_ms = RedisService.RATE_LIMIT_TTL * 1000
+        bucket, elapsed = divmod(int(time.time() * 1000), window_ms)
+        key = _RATE_LIMIT_PREFIX + ip + ":"
+        return _rate_limit_script(
+            keys=[key + str(bucket), key + str(bucket - 1)],
+            args=[window_ms, elapsed],
+            client=client,
+        )
     
     @staticmethod
     def check_rate_limit(ip: str, limit: Optional[int] = None) -> tuple[bool, int]:
@@ -153,22 +452,14 @@ class RedisService:
         if not USE_REDIS:
             return True, limit - 1
         
-        key = f"{RedisService.RATE_LIMIT_PREFIX}{ip}"
-        
         try:
-            current_val = redis_client.get(key)
-            
-            if current_val is None:
-                redis_client.setex(key, RedisService.RATE_LIMIT_TTL, 1)
-                return True, limit - 1
-            
-            current = int(str(current_val))
+            # Both buckets are read and updated atomically in one round trip
+            current = int(RedisService._rate_limit_hit(ip))
             
-            if current >= limit:
+            if current > limit:
                 return False, 0
             
-            redis_client.incr(key)
-            return True, limit - current - 1
+            return True, limit - current
             
         except (RedisConnectionError, RedisTimeoutError) as e:
             logger.warning(f"Redis connection error in rate limit check for {ip}: {e}")
@@ -180,22 +471,172 @@ class RedisService:
             logger.error(f"Invalid rate limit value for {ip}: {e}")
             return True, limit
     
-
+    @staticmethod
+    def check_rate_limit_and_code(
+        ip: str, code: str, limit: Optional[int] = None
+    ) -> tuple[bool, int, Optional[bool]]:
+        """
+        check_rate_limit and code_status in a single round trip.
+        Returns (is_allowed, remaining_requests, code_status); each half
+        fails open on its own like the individual methods.
+        """
+        if limit is None:
+            limit = get_int("RATE_LIMIT_PER_HOUR")
+        
+        if not USE_REDIS:
+            return True, limit - 1, None
+        
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            RedisService._rate_limit_hit(ip, client=pipe)
+            pipe.exists(_LINK_PREFIX + code)
+            RedisService._queue_code_lookup(pipe, code)
+            current, cached, key_exists, member = pipe.execute(raise_on_error=False)
+        except RedisError as e:
+            logger.warning(f"Redis error in rate limit/code check for {ip}: {e}")
+            return True, limit, True if code in _pending_codes else None
+        
+        if isinstance(current, Exception):
+            logger.error(f"Redis error in rate limit check for {ip}: {current}")
+            allowed, remaining = True, limit
+        else:
+            current = int(current)
+            allowed, remaining = (current <= limit), max(limit - current, 0)
+        
+        if cached and not isinstance(cached, Exception):
+            return allowed, remaining, True
+        status = RedisService._code_lookup_result(key_exists, member)
+        return allowed, remaining, True if code in _pending_codes else status
+    
+    @staticmethod
+    def begin_codes_rebuild() -> Optional[str]:
+        """
+        Start a full rebuild of the used codes; call before reading codes from
+        the DB. Returns a token for sync_codes_from_db()/mark_codes_complete(),
+        or None if Redis is unavailable. The token's marker records the start
+        time and is lost with a FLUSHDB, which voids the rebuild.
+        """
+        if not USE_REDIS:
+            return None
+        token = secrets.token_hex(8)
+        try:
+            redis_client.set(
+                _CODES_REBUILD_PREFIX + token, time.time(), ex=RedisService.CODES_RECENT_WINDOW
+            )
+            return token
+        except RedisError as e:
+            logger.error(f"Redis error starting used-codes rebuild: {e}")
+            return None
     
     @staticmethod
-    def sync_codes_from_db(codes: list) -> bool:
-        """Sync all codes from database to Redis set."""
+    def mark_codes_complete(token: str) -> bool:
+        """
+        Set CODES_COMPLETE after a warm-up loaded every DB code into the live
+        used-codes key. Returns False if a FLUSHDB voided the rebuild.
+        """
         if not USE_REDIS:
-            return True
+            return False
         try:
-            if codes:
-                redis_client.delete(RedisService.CODES_SET)
-                redis_client.sadd(RedisService.CODES_SET, *codes)
+            return bool(RedisService._finish_codes_rebuild(redis_client, token, ""))
+        except RedisError as e:
+            logger.error(f"Redis error marking used codes complete: {e}")
+            return False
+    
+    @staticmethod
+    def _finish_codes_rebuild(client: Any, token: str, tmp_key: str) -> Any:
+        """Run _CODES_REBUILD_LUA for ``token`` (queued if ``client`` is a pipeline)."""
+        live_key = RedisService.CODES_BLOOM if _use_bloom else RedisService.CODES_SET
+        return _codes_rebuild_script(
+            keys=[
+                _CODES_REBUILD_PREFIX + token, tmp_key, live_key,
+                RedisService.CODES_RECENT, RedisService.CODES_COMPLETE,
+            ],
+            args=[int(_use_bloom), RedisService.CODES_CLOCK_SKEW],
+            client=client,
+        )
+    
+    @staticmethod
+    def sync_codes_from_db(codes: list, token: Optional[str]) -> bool:
+        """
+        Sync all codes from database to Redis set.
+        The set is rebuilt under a temporary key in bounded SADD chunks and
+        swapped in by _CODES_REBUILD_LUA, all in one pipelined round trip, so
+        readers never see a missing or partial set. Codes flushed after
+        begin_codes_rebuild() (``token``) are merged in at the swap, which
+        then sets CODES_COMPLETE.
+        """
+        if not USE_REDIS:
             return True
+        if token is None:
+            return False
+        try:
+            size = RedisService.CODES_SYNC_CHUNK
+            pipe = redis_client.pipeline(transaction=False)
+            if _use_bloom:
+                # Rebuilding also drops codes of links deleted since the last sync
+                tmp_key = f"{RedisService.CODES_BLOOM}:rebuild:{token}"
+                RedisService._reserve_bloom(pipe, tmp_key)
+                for i in range(0, len(codes), size):
+                    pipe.execute_command("BF.MADD", tmp_key, *codes[i:i + size])
+            else:
+                tmp_key = f"{RedisService.CODES_SET}:rebuild:{token}"
+                for i in range(0, len(codes), size):
+                    pipe.sadd(tmp_key, *codes[i:i + size])
+            # Left behind if the swap never runs; the swap clears the TTL
+            pipe.expire(tmp_key, RedisService.CODES_RECENT_WINDOW)
+            RedisService._finish_codes_rebuild(pipe, token, tmp_key)
+            swapped = pipe.execute()[-1]
+            if not swapped:
+                logger.warning("Redis was flushed during the used-codes sync; skipped the swap")
+            return bool(swapped)
         except RedisError as e:
             logger.error(f"Redis error syncing codes from DB: {e}")
             return False
     
+    @staticmethod
+    def cache_api_key(key_hash: str, data: dict[str, Any]) -> bool:
+        """Cache a validated API key's row data, keyed by its hash."""
+        if not USE_REDIS:
+            return False
+        try:
+            redis_client.set(
+                _API_KEY_PREFIX + key_hash,
+                orjson.dumps(data),
+                ex=RedisService.API_KEY_CACHE_TTL,
+            )
+            return True
+        except RedisError as e:
+            logger.warning(f"Redis error caching API key: {e}")
+            return False
+    
+    @staticmethod
+    def get_cached_api_key(key_hash: str) -> Optional[dict[str, Any]]:
+        """Get cached API key row data by key hash."""
+        if not USE_REDIS:
+            return None
+        try:
+            raw = redis_client.get(_API_KEY_PREFIX + key_hash)
+            if raw is None:
+                return None
+            return orjson.loads(cast(bytes, raw))
+        except RedisError as e:
+            logger.warning(f"Redis error getting cached API key: {e}")
+            return None
+        except orjson.JSONDecodeError:
+            return None
+    
+    @staticmethod
+    def delete_cached_api_key(key_hash: str) -> bool:
+        """Invalidate a cached API key."""
+        if not USE_REDIS:
+            return False
+        try:
+            redis_client.delete(_API_KEY_PREFIX + key_hash)
+            return True
+        except RedisError as e:
+            logger.error(f"Redis error deleting cached API key: {e}")
+            return False
+    
     @staticmethod
     def health_check() -> bool:
         """Check Redis connection health."""
@@ -209,3 +650,11 @@ class RedisService:
         except RedisError as e:
             logger.error(f"Redis health check failed: {e}")
             return False
+
+
+# Key prefixes bound at module level: plain concatenation with a global is
+# the cheapest way to build a key on the per-request paths.
+_LINK_PREFIX = RedisService.LINK_CACHE_PREFIX
+_RATE_LIMIT_PREFIX = RedisService.RATE_LIMIT_PREFIX
+_API_KEY_PREFIX = RedisService.API_KEY_PREFIX
+_CODES_REBUILD_PREFIX = "codes:rebuild:"
@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+import hashlib
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import cast, Optional
 from datetime import datetime
 
 from .database import get_db
-from .models import Link, ApiKey
+from .env import get_int_optional
+from .models import ApiKey
 from .schemas import (
     ShortenRequest,
     ShortenResponse,
     LinkStatsResponse,
     LinkPreviewResponse,
+    CodeAvailabilityResponse,
     ErrorResponse,
     PasswordUnlockRequest,
     PasswordUnlockResponse,
@@ -21,7 +26,7 @@ from .schemas import (
 )
 from .services import LinkService
 from .redis_client import RedisService
-from .utils import format_short_url, is_reserved_code
+from .utils import format_short_url, get_reserved_codes
 from .auth import get_optional_api_key
 from .captcha import verify_turnstile, is_turnstile_enabled
 from .logging_config import get_logger
@@ -30,6 +35,32 @@ logger = get_logger(__name__)
 
 router = APIRouter()
 
+# RedisService and the SQLAlchemy session are synchronous (they are shared
+# with the CLI and background tasks), so handlers run their calls in the
+# threadpool rather than blocking the event loop on a Redis or DB round trip.
+
+
+# Previews change only when a link is deleted, so browsers and the CDN may
+# reuse them for a minute; password-protected ones are never cached.
+# Availability flips as soon as a code is claimed, so /check is only cached
+# by the browser and only for a few seconds.
+PREVIEW_CACHE_CONTROL = "public, max-age=60, s-maxage=60"
+PROTECTED_PREVIEW_CACHE_CONTROL = "private, no-store"
+CHECK_CACHE_CONTROL = "private, max-age=10"
+# Each unlock attempt runs a memory-hard Argon2id verify, so attempts are
+# limited per IP in their own bucket (separate from /shorten's)
+UNLOCK_RATE_LIMIT_PER_HOUR = get_int_optional("UNLOCK_RATE_LIMIT_PER_HOUR", 20)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match covers etag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or any(
+        tag.strip().removeprefix("W/") == etag for tag in header.split(",")
+    )
+
 
 def get_client_ip(request: Request) -> str:
     """Extract client IP, considering Cloudflare headers."""
@@ -39,9 +70,11 @@ def get_client_ip(request: Request) -> str:
     
     forwarded = request.headers.get("X-Forwarded-For")
     if forwarded:
-        return forwarded.split(",")[0].strip()
+        # Only the first hop is needed; partition avoids building a list
+        return forwarded.partition(",")[0].strip()
     
-    return request.client.host if request.client else "unknown"
+    client = request.client
+    return client.host if client else "unknown"
 
 
 @router.post(
@@ -90,7 +123,14 @@ async def create_short_link(
                     detail="CAPTCHA verification failed. Please try again."
                 )
     
-    allowed, remaining = RedisService.check_rate_limit(client_ip, rate_limit)
+    # With a custom code, the limiter and the code lookup share one round trip
+    code_status = None
+    if data.custom_code:
+        allowed, remaining, code_status = await run_in_threadpool(
+            RedisService.check_rate_limit_and_code, client_ip, data.custom_code.lower(), rate_limit
+        )
+    else:
+        allowed, remaining = await run_in_threadpool(RedisService.check_rate_limit, client_ip, rate_limit)
     if not allowed:
         raise HTTPException(
             status_code=429,
@@ -98,14 +138,20 @@ async def create_short_link(
             headers={"X-RateLimit-Remaining": "0"}
         )
     
-    link, error = LinkService.create_link(
+    # A Bloom filter positive may be false; create_link asks the DB in that case
+    if code_status and RedisService.code_filter_exact():
+        raise HTTPException(status_code=400, detail="This short code is already taken")
+    
+    link, error = await run_in_threadpool(
+        LinkService.create_link,
         db=db,
         original_url=data.url,
         custom_code=data.custom_code,
         expires_in_days=data.expires_in_days,
         creator_ip=client_ip,
         password=data.password,
-        max_clicks=data.max_clicks
+        max_clicks=data.max_clicks,
+        code_status=code_status
     )
     
     if error:
@@ -135,7 +181,7 @@ async def get_link_stats(
     db: Session = Depends(get_db)
 ):
     """Get statistics for a shortened link."""
-    stats = LinkService.get_link_stats(db, code.lower())
+    stats = await run_in_threadpool(LinkService.get_link_stats, db, code.lower())
     
     if not stats:
         raise HTTPException(status_code=404, detail="Link not found")
@@ -160,16 +206,28 @@ async def get_link_stats(
 )
 async def preview_link(
     code: str,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """Preview a link before redirecting."""
-    url, expired = LinkService.get_original_url(db, code.lower())
+    url, expired, protected = await run_in_threadpool(LinkService.resolve_link, db, code.lower())
 
     if not url:
         if expired:
             raise HTTPException(status_code=410, detail="Link expired")
         raise HTTPException(status_code=404, detail="Link not found")
 
+    if protected:
+        response.headers["Cache-Control"] = PROTECTED_PREVIEW_CACHE_CONTROL
+    else:
+        # Strong validator over everything the body depends on
+        etag = '"' + hashlib.blake2b(f"{code.lower()}:{url}".encode(), digest_size=8).hexdigest() + '"'
+        headers = {"ETag": etag, "Cache-Control": PREVIEW_CACHE_CONTROL}
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+
     return LinkPreviewResponse(
         suffix=code.lower(),
         original_url=url,
@@ -177,23 +235,37 @@ async def preview_link(
     )
 
 
-@router.get("/check/{code}")
+@router.get(
+    "/check/{code}",
+    response_model=CodeAvailabilityResponse,
+    response_model_exclude_none=True
+)
 async def check_code_availability(
     code: str,
+    response: Response,
     db: Session = Depends(get_db)
 ):
-    """Check if a custom code is available."""
+    """
+    Check if a custom code is available.
+    The answer is advisory: a code can be claimed between this check and a
+    create, and create_link's unique insert is what rejects duplicates.
+    """
     code_lower = code.lower()
+    response.headers["Cache-Control"] = CHECK_CACHE_CONTROL
     
-    if is_reserved_code(code_lower):
+    if code_lower in get_reserved_codes():
         return {"available": False, "reason": "reserved"}
     
-    if RedisService.code_exists(code_lower):
+    # Redis answers most lookups on its own; its misses may lag creates still
+    # in another worker's buffer. A Bloom filter positive may be false, and
+    # Redis may be unable to answer; let the DB decide then.
+    code_status = await run_in_threadpool(RedisService.code_status, code_lower)
+    if code_status is False:
+        return {"available": True}
+    if code_status and RedisService.code_filter_exact():
         return {"available": False, "reason": "taken"}
     
-    existing = db.query(Link).filter(Link.suffix == code_lower).first()
-    
-    if existing:
+    if await run_in_threadpool(LinkService.is_code_taken, db, code_lower):
         return {"available": False, "reason": "taken"}
     
     return {"available": True}
@@ -202,15 +274,32 @@ async def check_code_availability(
 @router.post(
     "/unlock/{code}",
     response_model=PasswordUnlockResponse,
-    responses={401: {"model": ErrorResponse}, 404: {"model": ErrorResponse}}
+    responses={
+        401: {"model": ErrorResponse},
+        404: {"model": ErrorResponse},
+        429: {"model": ErrorResponse}
+    }
 )
 async def unlock_password_link(
+    request: Request,
     code: str,
     data: PasswordUnlockRequest,
     db: Session = Depends(get_db)
 ):
     """Unlock a password-protected link."""
-    success, url = LinkService.verify_link_password(db, code.lower(), data.password)
+    allowed, _ = await run_in_threadpool(
+        RedisService.check_rate_limit, "unlock:" + get_client_ip(request), UNLOCK_RATE_LIMIT_PER_HOUR
+    )
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many unlock attempts. Please try again later.",
+            headers={"X-RateLimit-Remaining": "0"}
+        )
+    
+    success, url = await run_in_threadpool(
+        LinkService.verify_link_password, db, code.lower(), data.password
+    )
     
     if not url:
         # Link doesn't exist
@@ -246,16 +335,16 @@ async def bulk_shorten(
     success_count = 0
     error_count = 0
     
-    for item in data.urls:
-        link, error = LinkService.create_link(
-            db=db,
-            original_url=item.url,
-            custom_code=item.custom_code,
-            expires_in_days=item.expires_in_days,
-            creator_ip=client_ip
-        )
-        
-        if error:
+    # Collision checks and inserts are batched; keep the blocking DB work off the event loop
+    created = await run_in_threadpool(
+        LinkService.create_links_bulk,
+        db,
+        [(item.url, item.custom_code, item.expires_in_days) for item in data.urls],
+        client_ip
+    )
+    
+    for item, (suffix, error) in zip(data.urls, created):
+        if error or not suffix:
             results.append(BulkShortenResultItem(
                 success=False,
                 url=item.url,
@@ -266,8 +355,8 @@ async def bulk_shorten(
             results.append(BulkShortenResultItem(
                 success=True,
                 url=item.url,
-                short_url=format_short_url(cast(str, link.suffix)),
-                suffix=cast(str, link.suffix)
+                short_url=format_short_url(suffix),
+                suffix=suffix
             ))
             success_count += 1
     
@@ -296,7 +385,7 @@ async def bulk_delete(
             detail="API key required for bulk operations"
         )
     
-    deleted_count, not_found = LinkService.bulk_delete_links(db, data.suffixes)
+    deleted_count, not_found = await run_in_threadpool(LinkService.bulk_delete_links, db, data.suffixes)
     
     return BulkDeleteResponse(
         deleted_count=deleted_count,
@@ -2,9 +2,12 @@ from pydantic import BaseModel, HttpUrl, Field, field_validator, model_validator
 from typing import Optional, List, Union
 from datetime import datetime, timezone
 import re
-from .utils import utc_now, normalize_utc
+from .utils import utc_now, normalize_utc, is_valid_url
 from .security import validate_url_security, sanitize_custom_code
 
+# Compiled once at import
+_ISO_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
 
 class ShortenRequest(BaseModel):
     """Request schema for creating a short link."""
@@ -36,24 +39,21 @@ class ShortenRequest(BaseModel):
         description="Maximum number of clicks before link expires (optional)"
     )
     
+    # URL and code checks stay in Python validators rather than Field(pattern=...):
+    # pydantic-core would report a generic "String should match pattern" error,
+    # and the frontend shows these messages to users. The regex is ~1µs of a
+    # request's validation; the security checks need Python anyway.
     @field_validator('url')
     @classmethod
     def validate_url(cls, v):
-        # Basic URL format validation
-        url_pattern = re.compile(
-            r'^https?://'  # http:// or https://
-            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain
-            r'localhost|'  # localhost
-            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # or IP
-            r'(?::\d+)?'  # optional port
-            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-        
-        if not url_pattern.match(v):
-            raise ValueError('Invalid URL format. Must start with http:// or https://')
-        
+        # Check length first so oversized input never reaches the regex
         if len(v) > 2048:
             raise ValueError('URL too long. Maximum 2048 characters.')
         
+        # Basic URL format validation
+        if not is_valid_url(v):
+            raise ValueError('Invalid URL format. Must start with http:// or https://')
+        
         # Security validation - block private IPs, localhost, dangerous URLs
         is_safe, error = validate_url_security(v)
         if not is_safe:
@@ -96,7 +96,7 @@ class ShortenRequest(BaseModel):
                 # Accept date-only like YYYY-MM-DD or full ISO
                 if isinstance(raw, str):
                     # If only date provided, append time to parse
-                    if re.match(r'^\d{4}-\d{2}-\d{2}$', raw):
+                    if _ISO_DATE_RE.match(raw):
                         selected = datetime.fromisoformat(raw + 'T00:00:00').replace(tzinfo=timezone.utc)
                     else:
                         selected = datetime.fromisoformat(raw)
@@ -150,6 +150,13 @@ class LinkPreviewResponse(BaseModel):
     warning: Optional[str] = None
 
 
+class CodeAvailabilityResponse(BaseModel):
+    """Response schema for custom code availability."""
+    
+    available: bool
+    reason: Optional[str] = None
+
+
 class ErrorResponse(BaseModel):
     """Standard error response."""
     
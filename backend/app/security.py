@@ -5,6 +5,8 @@ Blocks private IPs, localhost, and dangerous URLs.
 
 import ipaddress
 import re
+from bisect import bisect_right
+from functools import lru_cache
 from typing import Optional, Tuple
 from urllib.parse import urlparse
 
@@ -35,45 +37,80 @@ DEFAULT_BLOCKED_DOMAINS = [
 # Blocked URL schemes
 BLOCKED_SCHEMES = {"file", "ftp", "data", "javascript", "vbscript"}
 
+# Custom codes: alphanumeric and hyphens, no leading/trailing hyphen
+_CUSTOM_CODE_RE = re.compile(r'^[a-z0-9][a-z0-9-]*[a-z0-9]$|^[a-z0-9]$')
+_DANGEROUS_CODE_PATTERNS = tuple(
+    re.compile(p, re.IGNORECASE)
+    for p in (r'<script', r'javascript:', r'on\w+=', r'<iframe', r'<img')
+)
+
+# Translation table for escape_html
+_HTML_ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;",
+    '"': "&quot;",
+    "'": "&#x27;",
+    ">": "&gt;",
+    "<": "&lt;",
+})
+
+
+def _range_table(version: int) -> tuple[list[int], list[int]]:
+    """Sorted (starts, ends) integer bounds of the private ranges for one IP version."""
+    nets = sorted(
+        (n for n in PRIVATE_IP_RANGES if n.version == version),
+        key=lambda n: int(n.network_address),
+    )
+    return [int(n.network_address) for n in nets], [int(n.broadcast_address) for n in nets]
+
+
+# The ranges don't overlap, so one bisect finds the only candidate network
+_PRIVATE_RANGES = {4: _range_table(4), 6: _range_table(6)}
+
 
 def is_private_ip(ip_str: str) -> bool:
     """Check if an IP address is private, localhost, or reserved."""
+    # Hostnames (the common case) end in a letter and have no colon;
+    # skip the parse attempt and its ValueError for them
+    if not ip_str or (":" not in ip_str and not ip_str[-1].isdigit()):
+        return False
     try:
         ip = ipaddress.ip_address(ip_str)
-        for network in PRIVATE_IP_RANGES:
-            if ip in network:
-                return True
-        return False
     except ValueError:
         return False
+    starts, ends = _PRIVATE_RANGES[ip.version]
+    n = int(ip)
+    i = bisect_right(starts, n) - 1
+    return i >= 0 and n <= ends[i]
 
 
-def get_blocked_domains() -> set:
-    """Get the set of blocked domains from environment and defaults."""
+@lru_cache(maxsize=1)
+def get_blocked_domains() -> frozenset:
+    """
+    Get the set of blocked domains from environment and defaults.
+    Read once per process; call get_blocked_domains.cache_clear() to reload.
+    """
     blocked = set(DEFAULT_BLOCKED_DOMAINS)
     try:
         env_blocked = get_json_list("BLOCKED_DOMAINS")
         blocked.update(d.lower() for d in env_blocked)
     except RuntimeError:
         pass
-    return blocked
+    return frozenset(blocked)
 
 
 def is_domain_blocked(domain: str) -> bool:
-    """Check if a domain is in the blocklist."""
+    """Check if a domain or any of its parent domains is in the blocklist."""
     domain_lower = domain.lower()
     blocked = get_blocked_domains()
     
-    # Check exact match
-    if domain_lower in blocked:
-        return True
-    
-    # Check if it's a subdomain of a blocked domain
-    for blocked_domain in blocked:
-        if domain_lower.endswith("." + blocked_domain):
+    # One set lookup per label (a.b.example -> b.example -> example)
+    # instead of scanning every blocked domain
+    while True:
+        if domain_lower in blocked:
             return True
-    
-    return False
+        _, sep, domain_lower = domain_lower.partition(".")
+        if not sep:
+            return False
 
 
 def extract_host_from_url(url: str) -> Optional[str]:
@@ -96,13 +133,11 @@ def validate_url_security(url: str) -> Tuple[bool, Optional[str]]:
     if not url:
         return False, "URL is required"
     
-    url_lower = url.lower().strip()
-    
     # Check URL length
     if len(url) > 2048:
         return False, "URL too long (max 2048 characters)"
     
-    # Check scheme
+    # Parse once; scheme and host checks share the result
     try:
         parsed = urlparse(url)
         scheme = parsed.scheme.lower()
@@ -113,11 +148,10 @@ def validate_url_security(url: str) -> Tuple[bool, Optional[str]]:
         if scheme in BLOCKED_SCHEMES:
             return False, f"URL scheme '{scheme}' is not allowed"
         
+        host = parsed.hostname
     except Exception:
         return False, "Invalid URL format"
     
-    # Extract host
-    host = extract_host_from_url(url)
     if not host:
         return False, "Could not extract host from URL"
     
@@ -131,16 +165,18 @@ def validate_url_security(url: str) -> Tuple[bool, Optional[str]]:
         logger.warning(f"Private IP attempted: {host}")
         return False, "URLs pointing to private/local addresses are not allowed"
     
-    # Check for common bypass attempts
-    bypass_patterns = [
-        r"^https?://[^/]*@",  # URL with credentials
-        r"^https?://.*\x00",  # Null byte injection
-        r"^https?://\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}",  # Direct IP (unless allowed)
-    ]
-    
-    for pattern in bypass_patterns[:2]:  # Skip IP pattern for now
-        if re.match(pattern, url_lower):
-            return False, "Invalid URL format"
+    # Check for common bypass attempts: null byte injection and credentials
+    # before the first slash (a direct-IP check is deliberately not applied;
+    # private IPs are rejected above). Both are plain character scans of the
+    # URL as given, so no lowercased copy is needed.
+    if "\x00" in url:
+        return False, "Invalid URL format"
+    authority_start = url.find("://") + 3  # the scheme check above guarantees "://"
+    authority_end = url.find("/", authority_start)
+    if authority_end < 0:
+        authority_end = len(url)
+    if url.find("@", authority_start, authority_end) >= 0:
+        return False, "Invalid URL format"
     
     return True, None
 
@@ -162,20 +198,12 @@ def sanitize_custom_code(code: str) -> Tuple[bool, str, Optional[str]]:
     code = code.lower()
     
     # Only allow alphanumeric and hyphens
-    if not re.match(r'^[a-z0-9][a-z0-9-]*[a-z0-9]$|^[a-z0-9]$', code):
+    if not _CUSTOM_CODE_RE.match(code):
         return False, code, "Code must contain only letters, numbers, and hyphens. Cannot start or end with hyphen."
     
     # Check for potentially dangerous patterns
-    dangerous_patterns = [
-        r'<script',
-        r'javascript:',
-        r'on\w+=',
-        r'<iframe',
-        r'<img',
-    ]
-    
-    for pattern in dangerous_patterns:
-        if re.search(pattern, code, re.IGNORECASE):
+    for pattern in _DANGEROUS_CODE_PATTERNS:
+        if pattern.search(code):
             return False, code, "Invalid characters in code"
     
     return True, code, None
@@ -186,12 +214,4 @@ def escape_html(text: str) -> str:
     if not text:
         return text
     
-    html_escape_table = {
-        "&": "&amp;",
-        '"': "&quot;",
-        "'": "&#x27;",
-        ">": "&gt;",
-        "<": "&lt;",
-    }
-    
-    return "".join(html_escape_table.get(c, c) for c in text)
+    return text.translate(_HTML_ESCAPE_TABLE)
@@ -2,45 +2,147 @@ from datetime import datetime, timedelta
 from typing import Optional, Any, cast, List
 import time
 import hashlib
+from functools import lru_cache
+import hmac
+import os
+from cryptography.exceptions import InvalidKey
+from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, bindparam, delete, insert, select, update
 from sqlalchemy.exc import IntegrityError
 
 from .models import Link
 from .redis_client import RedisService
 from .utils import (
     generate_short_code,
+    generate_short_codes,
     is_reserved_code,
-    extract_domain,
-    detect_user_agent_type,
-    sanitize_referer,
     format_short_url,
     utc_now,
     normalize_utc
 )
-from .env import get_int
+from .env import get_int, get_int_optional
+from .local_cache import TTLCache
 from .logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Process-local cache of hot code -> URL mappings in front of Redis.
+# Entries never outlive the Redis TTL; deletions elsewhere may be seen
+# up to LOCAL_LINK_CACHE_TTL seconds late by other workers.
+_local_links = TTLCache(
+    maxsize=get_int_optional("LOCAL_LINK_CACHE_SIZE", 10000),
+    ttl=get_int_optional("LOCAL_LINK_CACHE_TTL", 60),
+)
+
+# Point lookups by suffix, built once so every call reuses the same cached
+# compiled statement (only the bound code changes).
+# Redirect cache misses only need these columns; skip ORM entity loading
+_DESTINATION_LOOKUP_STMT = select(
+    Link.destination, Link.expires_at, Link.password_hash.is_not(None).label("protected")
+).where(Link.suffix == bindparam("code"))
+# Existence checks, stats and unlocks read only the columns they need
+_CODE_TAKEN_STMT = select(Link.id).where(Link.suffix == bindparam("code"))
+_STATS_LOOKUP_STMT = select(Link.suffix, Link.destination, Link.created_at, Link.expires_at).where(
+    Link.suffix == bindparam("code")
+)
+_PASSWORD_LOOKUP_STMT = select(Link.password_hash, Link.destination).where(Link.suffix == bindparam("code"))
+
+
+_PROTECTED_MARK = RedisService.PROTECTED_MARK
+
+
+def _split_cached(value: str) -> tuple[str, bool, bool]:
+    """Turn a cached link value into resolve_link's (url, expired, protected)."""
+    if value.startswith(_PROTECTED_MARK):
+        return value[1:], False, True
+    return value, False, False
+
+
+@lru_cache(maxsize=1)
+def _custom_code_length_limits() -> tuple[int, int]:
+    """(MIN_CUSTOM_CODE_LENGTH, MAX_CUSTOM_CODE_LENGTH), read once per process."""
+    return get_int("MIN_CUSTOM_CODE_LENGTH"), get_int("MAX_CUSTOM_CODE_LENGTH")
+
+
+@lru_cache(maxsize=1)
+def _default_expiry_days() -> int:
+    """DEFAULT_EXPIRY_DAYS, read once per process."""
+    return get_int("DEFAULT_EXPIRY_DAYS")
+
+
 # Constants for retry logic
 MAX_RETRY_ATTEMPTS = 3
 RETRY_BASE_DELAY = 0.1  # seconds
+# Candidates checked per query when picking a random code after a collision
+RANDOM_CODE_BATCH = 32
+
+
+# Argon2id cost for link passwords: memory-hard, so a fixed budget per
+# guess (~0.1s) regardless of the attacker's SHA hardware
+PASSWORD_HASH_MEMORY_KIB = 64 * 1024
+PASSWORD_HASH_ITERATIONS = 2
 
 
 def hash_password(password: str) -> str:
-    """Hash a password using SHA-256."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash a password with Argon2id, encoded as a PHC string."""
+    kdf = Argon2id(
+        salt=os.urandom(16),
+        length=32,
+        iterations=PASSWORD_HASH_ITERATIONS,
+        lanes=1,
+        memory_cost=PASSWORD_HASH_MEMORY_KIB,
+    )
+    return kdf.derive_phc_encoded(password.encode())
+
+
+def is_legacy_password_hash(password_hash: str) -> bool:
+    """Whether a hash predates Argon2id (unsalted SHA-256 hex)."""
+    return not password_hash.startswith("$argon2")
 
 
 def verify_password(password: str, password_hash: str) -> bool:
-    """Verify a password against its hash."""
-    return hash_password(password) == password_hash
+    """Verify a password against its hash (Argon2id or legacy SHA-256)."""
+    if is_legacy_password_hash(password_hash):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, password_hash)
+    try:
+        Argon2id.verify_phc_encoded(password.encode(), password_hash)
+        return True
+    except InvalidKey:
+        return False
 
 
 class LinkService:
     """Service for managing shortened links."""
     
+    @staticmethod
+    def _check_custom_code(code: str) -> Optional[str]:
+        """Check a lowercased custom code against reserved words and length limits."""
+        if is_reserved_code(code):
+            logger.warning(f"Attempted reserved code: {code}")
+            return "This short code is reserved"
+        
+        min_len, max_len = _custom_code_length_limits()
+        if len(code) < min_len:
+            return f"Code must be at least {min_len} characters"
+        if len(code) > max_len:
+            return f"Code must be at most {max_len} characters"
+        return None
+    
+    @staticmethod
+    def _expiry_from_days(expires_in_days: Optional[int]) -> datetime:
+        """Expiry timestamp for a link, falling back to DEFAULT_EXPIRY_DAYS."""
+        days = expires_in_days or _default_expiry_days()
+        return utc_now() + timedelta(days=days)
+    
+    @staticmethod
+    def _free_random_code(db: Session, batch: int = RANDOM_CODE_BATCH) -> Optional[str]:
+        """Return a random code not in the DB, checking a batch of candidates in one query."""
+        candidates = list(dict.fromkeys(generate_short_codes(batch)))
+        taken = set(db.scalars(select(Link.suffix).where(Link.suffix.in_(candidates))))
+        return next((c for c in candidates if c not in taken), None)
+    
     @staticmethod
     def create_link(
         db: Session,
@@ -49,117 +151,198 @@ class LinkService:
         expires_in_days: Optional[int] = None,
         creator_ip: Optional[str] = None,
         password: Optional[str] = None,
-        max_clicks: Optional[int] = None
+        max_clicks: Optional[int] = None,
+        code_status: Optional[bool] = None
     ) -> tuple[Optional[Link], Optional[str]]:
         """
         Create a new shortened link.
         Returns (link, error_message).
-        Handles race conditions with retry logic.
+        The unique index on suffix decides collisions: the row is inserted
+        without probing first, and a conflict means "taken" for custom codes
+        or a retry with a fresh code for random ones.
+        Callers that already looked custom_code up in Redis pass the result
+        as code_status (see RedisService.check_rate_limit_and_code).
         """
-        # Generate or validate short code
+        # Validate custom code
         if custom_code:
             code = custom_code.lower()
             
-            # Check reserved words
-            if is_reserved_code(code):
-                logger.warning(f"Attempted reserved code: {code}")
-                return None, "This short code is reserved"
-            
-            # Check length
-            min_len = get_int("MIN_CUSTOM_CODE_LENGTH")
-            max_len = get_int("MAX_CUSTOM_CODE_LENGTH")
-            if len(code) < min_len:
-                return None, f"Code must be at least {min_len} characters"
-            if len(code) > max_len:
-                return None, f"Code must be at most {max_len} characters"
+            error = LinkService._check_custom_code(code)
+            if error:
+                return None, error
             
-            # Check if code exists (Redis first, then DB)
-            if RedisService.code_exists(code):
-                return None, "This short code is already taken"
-
-            existing = db.query(Link).filter(Link.suffix == code).first()
-            if existing:
+            # An exact Redis hit rejects the code without touching the DB
+            # (Bloom filter positives may be false, so those go to the insert)
+            if code_status is None:
+                code_status = RedisService.code_status(code)
+            if code_status and RedisService.code_filter_exact():
                 return None, "This short code is already taken"
-        else:
-            code = None
         
         # Calculate expiry
-        expires_at = None
-        if expires_in_days:
-            expires_at = utc_now() + timedelta(days=expires_in_days)
-        else:
-            default_days = get_int("DEFAULT_EXPIRY_DAYS")
-            expires_at = utc_now() + timedelta(days=default_days)
+        expires_at = LinkService._expiry_from_days(expires_in_days)
+        password_hash = hash_password(password) if password else None
         
         # Retry loop for handling race conditions
         for attempt in range(MAX_RETRY_ATTEMPTS):
+            if not custom_code:
+                # Insert blind first; after a collision the keyspace is crowded,
+                # so pick from a batch of candidates checked in one query
+                code = generate_short_code() if attempt == 0 else LinkService._free_random_code(db)
+                if code is None:
+                    logger.error("Failed to generate unique code after max attempts")
+                    return None, "Failed to generate unique code. Please try again."
+            
+            link = Link(
+                suffix=code,
+                destination=original_url,
+                created_at=utc_now(),
+                expires_at=expires_at,
+                ip_address=creator_ip,
+                password_hash=password_hash,
+                max_clicks=max_clicks,
+                click_count=0
+            )
+            
             try:
-                # Generate code if not custom
-                if not custom_code:
-                    max_attempts = 10
-                    code = None
-                    for _ in range(max_attempts):
-                        candidate = generate_short_code()
-                        if not RedisService.code_exists(candidate):
-                            existing = db.query(Link).filter(
-                                Link.suffix == candidate
-                            ).first()
-                            if not existing:
-                                code = candidate
-                                break
-                    
-                    if not code:
-                        logger.error("Failed to generate unique code after max attempts")
-                        return None, "Failed to generate unique code. Please try again."
-                
-                # Create link with optional password and max_clicks
-                password_hash = hash_password(password) if password else None
-                
-                link = Link(
-                    suffix=code,
-                    destination=original_url,
-                    created_at=utc_now(),
-                    expires_at=expires_at,
-                    ip_address=creator_ip,
-                    password_hash=password_hash,
-                    max_clicks=max_clicks,
-                    click_count=0
-                )
-                
                 db.add(link)
+                db.flush()
+                # Every column was set here, so detach instead of letting the
+                # commit expire the object and reloading it with refresh()
+                db.expunge(link)
                 db.commit()
-                db.refresh(link)
-                
-                # Cache in Redis
-                RedisService.cache_link(code, original_url, expires_at=expires_at)
-                RedisService.add_code_to_set(code)
-                
-                logger.info(f"Created link: {code} -> {original_url[:50]}...")
-                return link, None
-                
             except IntegrityError as e:
                 db.rollback()
                 
                 if custom_code:
-                    # Custom code collision - no retry
-                    logger.warning(f"Race condition: custom code already taken: {code}")
+                    logger.warning(f"Custom code already taken: {code}")
                     return None, "This short code is already taken"
                 
-                # Random code collision - retry with new code
+                # Random code collision - retry at once with a new code
+                # (waiting can't make a fresh random code less likely to collide)
                 if attempt < MAX_RETRY_ATTEMPTS - 1:
-                    delay = RETRY_BASE_DELAY * (2 ** attempt)  # Exponential backoff
-                    logger.info(f"Code collision, retrying in {delay}s (attempt {attempt + 1})")
+                    logger.info(f"Code collision, retrying (attempt {attempt + 1})")
+                    continue
+                logger.error(f"Failed to create link after {MAX_RETRY_ATTEMPTS} attempts: {e}")
+                return None, "Failed to create link due to high traffic. Please try again."
+            
+            # Cache in Redis: one SET round trip. The used-codes entry rides on
+            # the next batched flush rather than a second command here; the two
+            # need not be atomic because the DB unique index decides ownership.
+            RedisService.cache_link(
+                code, original_url, expires_at=expires_at, protected=password_hash is not None
+            )
+            RedisService.queue_code(code)
+            
+            logger.info(f"Created link: {code} -> {original_url[:50]}...")
+            return link, None
+        
+        return None, "Failed to create link. Please try again."
+    
+    @staticmethod
+    def create_links_bulk(
+        db: Session,
+        items: List[tuple[str, Optional[str], Optional[int]]],
+        creator_ip: Optional[str] = None
+    ) -> List[tuple[Optional[str], Optional[str]]]:
+        """
+        Create several links from (url, custom_code, expires_in_days) items.
+        Returns one (suffix, error_message) per item, in order.
+        Collisions are checked with one query per attempt and all rows are
+        written in one INSERT and one commit. If a concurrent writer takes a
+        code first, the whole batch is re-checked and retried.
+        """
+        results: List[tuple[Optional[str], Optional[str]]] = [(None, None)] * len(items)
+        custom: dict[int, str] = {}
+        
+        # Validate custom codes (including duplicates within the batch)
+        for i, (_, custom_code, _) in enumerate(items):
+            if not custom_code:
+                continue
+            code = custom_code.lower()
+            error = LinkService._check_custom_code(code)
+            if not error and code in custom.values():
+                error = "This short code is already taken"
+            if error:
+                results[i] = (None, error)
+                continue
+            custom[i] = code
+        random_items = [i for i, (_, custom_code, _) in enumerate(items) if not custom_code]
+        
+        for attempt in range(MAX_RETRY_ATTEMPTS):
+            # One query for every custom code that is already taken
+            taken = set(db.scalars(select(Link.suffix).where(Link.suffix.in_(set(custom.values()))))) if custom else set()
+            for i, code in list(custom.items()):
+                if code in taken:
+                    results[i] = (None, "This short code is already taken")
+                    del custom[i]
+            codes = dict(custom)
+            
+            # Random codes: regenerate only the candidates that collide
+            pending = random_items
+            for _ in range(10):
+                if not pending:
+                    break
+                candidates = dict(zip(pending, generate_short_codes(len(pending))))
+                taken.update(db.scalars(
+                    select(Link.suffix).where(Link.suffix.in_(set(candidates.values())))
+                ))
+                used = set(codes.values())
+                retry = []
+                for i, candidate in candidates.items():
+                    if candidate in taken or candidate in used:
+                        retry.append(i)
+                    else:
+                        codes[i] = candidate
+                        used.add(candidate)
+                pending = retry
+            for i in pending:
+                logger.error("Failed to generate unique code after max attempts")
+                results[i] = (None, "Failed to generate unique code. Please try again.")
+            
+            if not codes:
+                return results
+            
+            now = utc_now()
+            rows = [
+                {
+                    "suffix": code,
+                    "destination": items[i][0],
+                    "created_at": now,
+                    "expires_at": LinkService._expiry_from_days(items[i][2]),
+                    "ip_address": creator_ip,
+                    "click_count": 0,
+                }
+                for i, code in codes.items()
+            ]
+            try:
+                db.execute(insert(Link), rows)
+                db.commit()
+                break
+            except IntegrityError as e:
+                # Lost a race with another writer; re-check the whole batch
+                db.rollback()
+                if attempt < MAX_RETRY_ATTEMPTS - 1:
+                    delay = RETRY_BASE_DELAY * (2 ** attempt)
+                    logger.info(f"Bulk insert collided, retrying in {delay}s (attempt {attempt + 1})")
                     time.sleep(delay)
                 else:
-                    logger.error(f"Failed to create link after {MAX_RETRY_ATTEMPTS} attempts: {e}")
-                    return None, "Failed to create link due to high traffic. Please try again."
+                    logger.error(f"Failed to bulk create links after {MAX_RETRY_ATTEMPTS} attempts: {e}")
+                    for i in codes:
+                        results[i] = (None, "Failed to create link due to high traffic. Please try again.")
+                    return results
         
-        return None, "Failed to create link. Please try again."
+        RedisService.cache_links([(row["suffix"], row["destination"], row["expires_at"]) for row in rows])
+        for i, code in codes.items():
+            RedisService.queue_code(code)
+            results[i] = (code, None)
+        
+        logger.info(f"Bulk created {len(rows)} links")
+        return results
     
     @staticmethod
-    def get_link_by_code(db: Session, code: str) -> Optional[Link]:
-        """Get a link by its suffix."""
-        return db.query(Link).filter(Link.suffix == code).first()
+    def is_code_taken(db: Session, code: str) -> bool:
+        """Whether a link row (expired or not) uses this suffix."""
+        return db.execute(_CODE_TAKEN_STMT, {"code": code}).first() is not None
     
     @staticmethod
     def get_original_url(db: Session, code: str) -> tuple[Optional[str], bool]:
@@ -169,110 +352,97 @@ class LinkService:
         Checks Redis cache first, falls back to DB. If DB row exists but is expired,
         returns (None, True). If not found, returns (None, False).
         """
-        # Check cache first
-        cached = RedisService.get_cached_link(code)
+        url, expired, _ = LinkService.resolve_link(db, code)
+        return url, expired
+    
+    @staticmethod
+    def resolve_link(db: Session, code: str) -> tuple[Optional[str], bool, bool]:
+        """
+        get_original_url plus whether the link is password-protected.
+        Returns (url_or_none, expired_flag, protected). The flag is cached
+        alongside the URL, so cache hits need no extra lookup.
+        """
+        # Check the in-process cache, then Redis
+        cached = _local_links.get(code)
         if cached:
-            return cached, False
+            return _split_cached(cached)
+        
+        raw, ttl, code_status = RedisService.lookup_link(code)
+        if raw:
+            cached = raw.decode()
+            _local_links.set(code, cached, ttl)
+            return _split_cached(cached)
+        
+        # code_status is False only while CODES_COMPLETE vouches that every
+        # suffix with a DB row (expired ones included) is in the used codes,
+        # and new links are cached before their code is, so that miss is a
+        # 404 without a query. This keeps scans for random codes off the DB.
+        if code_status is False:
+            return None, False, False
 
-        # Check database
-        link = db.query(Link).filter(Link.suffix == code).first()
+        # Check database. Expiry is checked here rather than in SQL: one query
+        # then tells hits, expired rows and misses apart, where a SQL filter
+        # would need a second query on every miss (bot probes included).
+        row = db.execute(_DESTINATION_LOOKUP_STMT, {"code": code}).first()
 
-        if not link:
-            return None, False
+        if not row:
+            return None, False, False
 
         # Check expiry
-        expires_at_val = normalize_utc(cast(Optional[datetime], link.expires_at))
-        if expires_at_val and expires_at_val < utc_now():
-            # Ensure Redis doesn't have the expired key
-            RedisService.delete_cached_link(code)
-            RedisService.remove_code_from_set(code)
-            return None, True
+        expires_at_val = normalize_utc(cast(Optional[datetime], row.expires_at))
+        now = utc_now()
+        if expires_at_val and expires_at_val < now:
+            # Ensure Redis doesn't have the expired key (the row, and so the
+            # code, stays reserved)
+            _local_links.pop(code)
+            RedisService.forget_links([code], release_codes=False)
+            return None, True, False
 
-        # Cache for future requests (set TTL based on DB expiry)
-        destination = cast(str, link.destination)
-        RedisService.cache_link(code, destination, expires_at=expires_at_val)
+        # Cache for future requests (set TTL based on DB expiry). The local
+        # entry also covers the next hits if Redis is unavailable.
+        destination = cast(str, row.destination)
+        protected = bool(row.protected)
+        RedisService.cache_link(code, destination, expires_at=expires_at_val, now=now, protected=protected)
+        ttl = (expires_at_val - now).total_seconds() if expires_at_val else None
+        _local_links.set(code, _PROTECTED_MARK + destination if protected else destination, ttl)
 
-        return destination, False
-    
-    @staticmethod
-    # Click recording removed per user's request
+        return destination, False, protected
     
     @staticmethod
     def get_link_stats(db: Session, code: str) -> Optional[dict[str, Any]]:
         """Get statistics for a link."""
-        link = db.query(Link).filter(Link.suffix == code).first()
+        row = db.execute(_STATS_LOOKUP_STMT, {"code": code}).first()
         
-        if not link:
+        if not row:
             return None
         
-        suffix = cast(str, link.suffix)
+        suffix = cast(str, row.suffix)
         return {
             "suffix": suffix,
-            "destination": cast(str, link.destination),
+            "destination": cast(str, row.destination),
             "short_url": format_short_url(suffix),
-            "created_at": cast(datetime, link.created_at),
-            "expires_at": cast(Optional[datetime], link.expires_at),
+            "created_at": cast(datetime, row.created_at),
+            "expires_at": cast(Optional[datetime], row.expires_at),
         }
     
     @staticmethod
     def deactivate_link(db: Session, code: str) -> bool:
         """Delete a link from DB and Redis."""
-        link = db.query(Link).filter(Link.suffix == code).first()
-        
-        if not link:
+        # One DELETE both checks existence and removes the row
+        result = db.execute(
+            delete(Link).where(Link.suffix == code),
+            execution_options={"synchronize_session": False}
+        )
+        if not result.rowcount:
+            db.rollback()
             return False
-        
-        db.delete(link)
         db.commit()
         
-        RedisService.delete_cached_link(code)
-        RedisService.remove_code_from_set(code)
+        _local_links.pop(code)
+        RedisService.forget_links([code])
         
         return True
     
-    @staticmethod
-    def cleanup_expired_links(db: Session) -> int:
-        """Remove expired entries from Redis. Returns number removed from Redis."""
-        now = utc_now()
-        expired_links = db.query(Link).filter(Link.expires_at != None).filter(Link.expires_at < now).all()
-        count = 0
-        for link in expired_links:
-            suffix = getattr(link, 'suffix', None)
-            if not suffix:
-                continue
-            try:
-                RedisService.delete_cached_link(suffix)
-                RedisService.remove_code_from_set(suffix)
-                count += 1
-            except Exception as e:
-                logger.warning(f"Failed to cleanup expired link {suffix}: {e}")
-                continue
-        
-        if count > 0:
-            logger.info(f"Cleaned up {count} expired links from Redis")
-        return count
-    
-    @staticmethod
-    def increment_click_count(db: Session, code: str) -> tuple[bool, bool]:
-        """
-        Increment click count for a link.
-        Returns (success, max_reached).
-        """
-        link = db.query(Link).filter(Link.suffix == code).first()
-        if not link:
-            return False, False
-        
-        # Increment click count
-        link.click_count = (link.click_count or 0) + 1
-        db.commit()
-        
-        # Check if max clicks reached
-        if link.max_clicks and link.click_count >= link.max_clicks:
-            logger.info(f"Link {code} reached max clicks ({link.max_clicks})")
-            return True, True
-        
-        return True, False
-    
     @staticmethod
     def verify_link_password(db: Session, code: str, password: str) -> tuple[bool, Optional[str]]:
         """
@@ -281,19 +451,28 @@ class LinkService:
         If link exists but password is wrong, returns (False, url).
         If link doesn't exist, returns (False, None).
         """
-        link = db.query(Link).filter(Link.suffix == code).first()
-        if not link:
+        row = db.execute(_PASSWORD_LOOKUP_STMT, {"code": code}).first()
+        if not row:
             return False, None
+        password_hash, destination = row
         
-        if not link.password_hash:
+        if not password_hash:
             # Link is not password protected
-            return True, link.destination
+            return True, destination
         
-        if verify_password(password, link.password_hash):
-            return True, link.destination
+        # verify_password compares in constant time for both hash formats
+        if verify_password(password, password_hash):
+            # Upgrade SHA-256 hashes from before Argon2id on first successful unlock
+            if is_legacy_password_hash(password_hash):
+                db.execute(
+                    update(Link).where(Link.suffix == code).values(password_hash=hash_password(password)),
+                    execution_options={"synchronize_session": False}
+                )
+                db.commit()
+            return True, destination
         
         # Password is wrong, but return the URL so caller knows link exists
-        return False, link.destination
+        return False, destination
     
     @staticmethod
     def bulk_delete_links(db: Session, suffixes: List[str]) -> tuple[int, List[str]]:
@@ -301,22 +480,28 @@ class LinkService:
         Delete multiple links by their suffixes.
         Returns (deleted_count, not_found_list).
         """
-        deleted_count = 0
-        not_found = []
+        wanted = [suffix.lower() for suffix in suffixes]
+        found = set(db.scalars(select(Link.suffix).where(Link.suffix.in_(set(wanted))))) if wanted else set()
         
-        for suffix in suffixes:
-            suffix_lower = suffix.lower()
-            link = db.query(Link).filter(Link.suffix == suffix_lower).first()
-            
-            if link:
-                db.delete(link)
-                RedisService.delete_cached_link(suffix_lower)
-                RedisService.remove_code_from_set(suffix_lower)
-                deleted_count += 1
+        deleted = []
+        not_found = []
+        for suffix, suffix_lower in zip(suffixes, wanted):
+            if suffix_lower in found:
+                found.discard(suffix_lower)
+                _local_links.pop(suffix_lower)
+                deleted.append(suffix_lower)
             else:
                 not_found.append(suffix)
         
+        if deleted:
+            # Only suffixes were selected, so there are no loaded Link objects to sync
+            db.execute(
+                delete(Link).where(Link.suffix.in_(deleted)),
+                execution_options={"synchronize_session": False},
+            )
         db.commit()
+        RedisService.forget_links(deleted)
+        deleted_count = len(deleted)
         logger.info(f"Bulk deleted {deleted_count} links")
         return deleted_count, not_found
 
@@ -7,56 +7,46 @@ import asyncio
 from datetime import datetime, timezone
 from typing import Optional
 
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
-from .database import get_db, engine, Base
+from .database import SessionLocal, engine, Base
 from .models import Link
 from .redis_client import RedisService
-from .services import LinkService
+from .auth import flush_api_key_usage, load_active_key_filter
 from .env import get_int_optional, get_bool_optional
 from .logging_config import get_logger
 from .utils import utc_now
 
 logger = get_logger(__name__)
 
+# The jobs below use the sync session and Redis client shared with the web
+# handlers and the CLI; the loops run them in the threadpool so a long query
+# never stalls the event loop serving redirects.
 
-async def cleanup_expired_links():
-    """
-    Background task to clean up expired links from Redis.
-    This keeps Redis in sync with database expiry.
-    """
-    db = next(get_db())
-    try:
-        count = LinkService.cleanup_expired_links(db)
-        if count > 0:
-            logger.info(f"Cleanup task removed {count} expired links from Redis")
-    except Exception as e:
-        logger.error(f"Error in cleanup_expired_links: {e}")
-    finally:
-        db.close()
-
-
-async def sync_redis_codes():
+
+def sync_redis_codes():
     """
     Sync Redis CODES_SET with database to fix any inconsistencies.
     This helps address the Redis memory leak issue.
     """
-    db = next(get_db())
-    try:
-        # Get all codes from database
-        links = db.query(Link.suffix).all()
-        codes = [link.suffix for link in links if link.suffix]
-        
-        # Sync with Redis
-        if RedisService.sync_codes_from_db(codes):
-            logger.info(f"Synced {len(codes)} codes to Redis CODES_SET")
-    except Exception as e:
-        logger.error(f"Error in sync_redis_codes: {e}")
-    finally:
-        db.close()
+    with SessionLocal() as db:
+        try:
+            # Start before the SELECT so codes created while it runs are kept
+            token = RedisService.begin_codes_rebuild()
+            
+            # Get all codes from database
+            codes = list(db.scalars(select(Link.suffix).where(Link.suffix.is_not(None))))
+            
+            # Sync with Redis
+            if RedisService.sync_codes_from_db(codes, token):
+                logger.info(f"Synced {len(codes)} codes to Redis CODES_SET")
+        except Exception as e:
+            logger.error(f"Error in sync_redis_codes: {e}")
 
 
-async def delete_expired_links_from_db():
+def delete_expired_links_from_db():
     """
     Delete expired links from database if configured to do so.
     By default, we keep expired links to preserve suffix reservations.
@@ -64,30 +54,56 @@ async def delete_expired_links_from_db():
     if not get_bool_optional("DELETE_EXPIRED_LINKS", False):
         return
     
-    db = next(get_db())
-    try:
-        now = utc_now()
-        expired = db.query(Link).filter(
-            Link.expires_at != None,
-            Link.expires_at < now
-        ).all()
-        
-        count = 0
-        for link in expired:
-            suffix = link.suffix
-            db.delete(link)
-            RedisService.delete_cached_link(suffix)
-            RedisService.remove_code_from_set(suffix)
-            count += 1
-        
-        if count > 0:
-            db.commit()
-            logger.info(f"Deleted {count} expired links from database")
-    except Exception as e:
-        logger.error(f"Error deleting expired links: {e}")
-        db.rollback()
-    finally:
-        db.close()
+    with SessionLocal() as db:
+        try:
+            now = utc_now()
+            expired = Link.expires_at < now
+            # The cutoff is fixed, so the DELETE removes exactly the rows selected
+            # here; MySQL has no DELETE ... RETURNING
+            suffixes = list(db.scalars(select(Link.suffix).where(expired)))
+            
+            count = len(suffixes)
+            if count > 0:
+                db.execute(delete(Link).where(expired), execution_options={"synchronize_session": False})
+                db.commit()
+                RedisService.forget_links(suffixes)
+                logger.info(f"Deleted {count} expired links from database")
+        except Exception as e:
+            logger.error(f"Error deleting expired links: {e}")
+            db.rollback()
+
+
+async def run_maintenance():
+    """
+    Run the periodic DB maintenance once.
+    Expired links need no Redis sweep: cache_link sets each key's TTL to the
+    link's expiry, so Redis drops them itself.
+    """
+    await run_in_threadpool(sync_redis_codes)
+    await run_in_threadpool(delete_expired_links_from_db)
+
+
+def flush_api_key_usage_to_db():
+    """
+    Write batched API key last_used_at updates to the database.
+    Runs frequently; a no-op when no keys were used since the last flush.
+    """
+    with SessionLocal() as db:
+        try:
+            count = flush_api_key_usage(db)
+            if count > 0:
+                logger.debug(f"Flushed last_used_at for {count} API keys")
+        except Exception as e:
+            logger.error(f"Error flushing API key usage: {e}")
+
+
+def refresh_api_key_filter():
+    """Reload the active API key filter so keys created elsewhere are accepted."""
+    with SessionLocal() as db:
+        try:
+            load_active_key_filter(db)
+        except Exception as e:
+            logger.error(f"Error refreshing API key filter: {e}")
 
 
 class BackgroundTaskRunner:
@@ -96,6 +112,9 @@ class BackgroundTaskRunner:
     def __init__(self):
         self._running = False
         self._task: Optional[asyncio.Task] = None
+        self._usage_task: Optional[asyncio.Task] = None
+        self._key_filter_task: Optional[asyncio.Task] = None
+        self._codes_task: Optional[asyncio.Task] = None
     
     async def _run_loop(self):
         """Main background task loop."""
@@ -106,24 +125,53 @@ class BackgroundTaskRunner:
         
         while self._running:
             try:
-                # Run cleanup tasks
-                await cleanup_expired_links()
-                await sync_redis_codes()
-                await delete_expired_links_from_db()
-                
+                await run_maintenance()
             except Exception as e:
                 logger.error(f"Error in background task loop: {e}")
             
             # Wait for next interval
             await asyncio.sleep(interval_seconds)
     
+    async def _usage_flush_loop(self):
+        """Periodically flush batched API key usage timestamps."""
+        interval_seconds = get_int_optional("API_KEY_USAGE_FLUSH_SECONDS", 30)
+        
+        while self._running:
+            await asyncio.sleep(interval_seconds)
+            await run_in_threadpool(flush_api_key_usage_to_db)
+    
+    async def _codes_flush_loop(self):
+        """Frequently write newly created codes to the Redis codes set in batches."""
+        interval_seconds = get_int_optional("CODES_FLUSH_INTERVAL_MS", 100) / 1000
+        
+        while self._running:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await run_in_threadpool(RedisService.flush_pending_codes)
+            except Exception as e:
+                logger.error(f"Error flushing pending codes: {e}")
+    
+    async def _key_filter_loop(self):
+        """Periodically reload the active API key filter."""
+        interval_seconds = get_int_optional("API_KEY_FILTER_REFRESH_SECONDS", 60)
+        
+        while self._running:
+            await asyncio.sleep(interval_seconds)
+            await run_in_threadpool(refresh_api_key_filter)
+    
     def start(self):
         """Start the background task runner."""
         if self._running:
             return
         
         self._running = True
-        self._task = asyncio.create_task(self._run_loop())
+        # Deployments with several web workers can disable this and run
+        # `python -m app.cli_tools cleanup` from one cron job instead
+        if get_bool_optional("BACKGROUND_CLEANUP_ENABLED", True):
+            self._task = asyncio.create_task(self._run_loop())
+        self._usage_task = asyncio.create_task(self._usage_flush_loop())
+        self._key_filter_task = asyncio.create_task(self._key_filter_loop())
+        self._codes_task = asyncio.create_task(self._codes_flush_loop())
         logger.info("Background task runner started")
     
     def stop(self):
@@ -132,6 +180,18 @@ class BackgroundTaskRunner:
         if self._task:
             self._task.cancel()
             self._task = None
+        if self._usage_task:
+            self._usage_task.cancel()
+            self._usage_task = None
+        if self._key_filter_task:
+            self._key_filter_task.cancel()
+            self._key_filter_task = None
+        if self._codes_task:
+            self._codes_task.cancel()
+            self._codes_task = None
+        # Don't lose usage/codes recorded since the last periodic flush
+        flush_api_key_usage_to_db()
+        RedisService.flush_pending_codes()
         logger.info("Background task runner stopped")
 
 
@@ -1,6 +1,8 @@
 import secrets
 import string
 import re
+import time
+from functools import lru_cache
 from urllib.parse import urlparse
 from typing import Optional
 from datetime import datetime, timezone
@@ -8,21 +10,59 @@ from user_agents import parse as parse_user_agent  # type: ignore
 from .env import get_env, get_int, get_json_list
 
 
+# URL-safe characters (similar to nanoid)
+_CODE_ALPHABET = (string.ascii_lowercase + string.digits).encode()
+# Bytes at or above the largest multiple of the alphabet size are dropped so
+# every character stays equally likely; the rest map to a character by modulo
+_CODE_BYTE_LIMIT = 256 - 256 % len(_CODE_ALPHABET)
+_CODE_BYTE_TABLE = bytes(_CODE_ALPHABET[i % len(_CODE_ALPHABET)] for i in range(256))
+_CODE_BYTES_DROPPED = bytes(range(_CODE_BYTE_LIMIT, 256))
+
+
+@lru_cache(maxsize=1)
+def _default_code_length() -> int:
+    """DEFAULT_CODE_LENGTH, read once per process."""
+    return get_int("DEFAULT_CODE_LENGTH")
+
+
 def generate_short_code(length: Optional[int] = None) -> str:
     """Generate a random short code using nanoid-style characters."""
     if length is None:
-        length = get_int("DEFAULT_CODE_LENGTH")
+        length = _default_code_length()
     
-    # URL-safe characters (similar to nanoid)
-    alphabet = string.ascii_lowercase + string.digits
-    return ''.join(secrets.choice(alphabet) for _ in range(length))
+    # One urandom read and one C-level translate instead of a
+    # secrets.choice() call per character
+    code = b""
+    while len(code) < length:
+        code += secrets.token_bytes(length + 2).translate(_CODE_BYTE_TABLE, _CODE_BYTES_DROPPED)
+    return code[:length].decode("ascii")
+
+
+def generate_short_codes(count: int, length: Optional[int] = None) -> list[str]:
+    """Generate ``count`` random short codes from a single urandom read."""
+    if length is None:
+        length = _default_code_length()
+    
+    needed = count * length
+    pool = b""
+    while len(pool) < needed:
+        # ~1.6% of bytes are dropped, so a small margin usually avoids a refill
+        pool += secrets.token_bytes(needed + needed // 32 + 2).translate(_CODE_BYTE_TABLE, _CODE_BYTES_DROPPED)
+    text = pool[:needed].decode("ascii")
+    return [text[i:i + length] for i in range(0, needed, length)]
+
 
+@lru_cache(maxsize=1)
+def get_reserved_codes() -> frozenset[str]:
+    """Lowercased RESERVED_CODES, parsed once per process."""
+    return frozenset(r.lower() for r in get_json_list("RESERVED_CODES"))
 
 
 def is_reserved_code(code: str) -> bool:
     """Check if a code is reserved."""
-    reserved = get_json_list("RESERVED_CODES")
-    return code.lower() in [r.lower() for r in reserved]
+    reserved = get_reserved_codes()
+    # Codes are usually lowercase already; only lowercase (and copy) on a miss
+    return code in reserved or code.lower() in reserved
 
 
 def extract_domain(url: str) -> Optional[str]:
@@ -34,17 +74,24 @@ def extract_domain(url: str) -> Optional[str]:
         return None
 
 
+# Compiled once at import; this runs on every shorten request.
+# Labels are dot-terminated and bounded at 63 chars, so backtracking stays
+# linear in the (2048-capped) input; no DFA engine is needed.
+_URL_RE = re.compile(
+    r'^https?://'  # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain
+    r'localhost|'  # localhost
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # or IP
+    r'(?::\d+)?'  # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
+
 def is_valid_url(url: str) -> bool:
     """Validate URL format."""
-    url_pattern = re.compile(
-        r'^https?://'
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'
-        r'localhost|'
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'
-        r'(?::\d+)?'
-        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-    
-    return bool(url_pattern.match(url))
+    # Most rejects fail the scheme; answer those without entering the regex
+    if url[:4].lower() != "http":
+        return False
+    return _URL_RE.match(url) is not None
 
 
 def detect_user_agent_type(user_agent_string: str) -> str:
@@ -83,10 +130,15 @@ def sanitize_referer(referer: str) -> Optional[str]:
         return None
 
 
+@lru_cache(maxsize=1)
+def _short_url_prefix() -> str:
+    """BASE_URL with exactly one trailing slash, read once per process."""
+    return get_env("BASE_URL").rstrip('/') + "/"
+
+
 def format_short_url(code: str) -> str:
     """Format a short code into a full URL."""
-    base = get_env("BASE_URL").rstrip('/')
-    return f"{base}/{code}"
+    return _short_url_prefix() + code
 
 
 def utc_now() -> datetime:
@@ -94,10 +146,32 @@ def utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
+# (monotonic second, UTC datetime) for utc_now_coarse
+_coarse_now: tuple[int, datetime] = (-1, datetime.min.replace(tzinfo=timezone.utc))
+
+
+def utc_now_coarse() -> datetime:
+    """
+    Return current UTC time at (at most) one-second granularity.
+    Reuses one datetime per second; for advisory timestamps like last_used_at.
+    """
+    global _coarse_now
+    tick = int(time.monotonic())
+    cached_tick, cached = _coarse_now
+    if tick != cached_tick:
+        cached = datetime.now(timezone.utc)
+        _coarse_now = (tick, cached)
+    return cached
+
+
 def normalize_utc(dt: Optional[datetime]) -> Optional[datetime]:
     """Normalize a datetime to timezone-aware UTC (assume naive is UTC)."""
     if dt is None:
         return None
-    if dt.tzinfo is None:
+    tz = dt.tzinfo
+    if tz is None:
         return dt.replace(tzinfo=timezone.utc)
+    # Values from utc_now() and the DB are already UTC; skip the conversion
+    if tz is timezone.utc:
+        return dt
     return dt.astimezone(timezone.utc)
@@ -22,10 +22,30 @@ CREATE TABLE IF NOT EXISTS links (
     -- Store UTC datetimes (application normalizes to UTC)
     expires_at DATETIME NULL,
     ip_address VARCHAR(255) NULL,
+    -- Argon2id PHC string (~100 chars); NULL when the link has no password
+    password_hash VARCHAR(255) NULL,
+    -- One-time/click-limited links; NULL max_clicks means unlimited
+    max_clicks INT NULL,
+    click_count INT NOT NULL DEFAULT 0,
+    -- OpenGraph preview data
+    og_title VARCHAR(255) NULL,
+    og_description TEXT NULL,
+    og_image VARCHAR(500) NULL,
     
-    INDEX idx_suffix (suffix),
+    -- suffix is covered by its UNIQUE index; no separate index needed
     INDEX idx_expires_at (expires_at),
     INDEX idx_created_at (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Clicks and blocked_domains tables removed per user request
+
+-- Upgrading an existing database: drop the old duplicate suffix index
+-- ALTER TABLE links DROP INDEX idx_suffix;
+-- and the old duplicate key_hash index (the column's unique index covers it)
+-- ALTER TABLE api_keys DROP INDEX idx_key_hash;
+
+-- Upgrading an existing database (required; see the README): link passwords
+-- are Argon2id PHC strings (~100 chars). Add the column if it is missing:
+-- ALTER TABLE links ADD COLUMN password_hash VARCHAR(255) NULL;
+-- or widen it if it was created as VARCHAR(64):
+-- ALTER TABLE links MODIFY password_hash VARCHAR(255) NULL;
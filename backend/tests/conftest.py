@@ -4,15 +4,11 @@ Provides test database, mock Redis, and FastAPI test client.
 """
 
 import pytest
+from contextlib import ExitStack
 from unittest.mock import MagicMock, patch
-import sys
-from pathlib import Path
 
-# Add parent directory to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
 from sqlalchemy.pool import StaticPool
 
 from fastapi.testclient import TestClient
@@ -22,78 +18,114 @@ from fastapi.testclient import TestClient
 class MockRedisService:
     """Mock Redis service for testing."""
     
-    _cache = {}
-    _codes_set = set()
-    _rate_limits = {}
+    def __init__(self):
+        self._cache = {}
+        self._codes_set = set()
+        self._rate_limits = {}
+        self._api_keys = {}
     
-    @classmethod
-    def reset(cls):
-        cls._cache = {}
-        cls._codes_set = set()
-        cls._rate_limits = {}
+    def cache_link(self, code: str, url: str, expires_at=None, pipe=None, now=None, protected=False) -> bool:
+        if protected:
+            url = "\x00" + url  # RedisService.PROTECTED_MARK
+        self._cache[code] = {"url": url, "expires_at": expires_at}
+        return True
     
-    @staticmethod
-    def cache_link(code: str, url: str, expires_at=None) -> bool:
-        MockRedisService._cache[code] = {"url": url, "expires_at": expires_at}
+    def cache_links(self, entries) -> bool:
+        for code, url, expires_at in entries:
+            self.cache_link(code, url, expires_at=expires_at)
         return True
     
-    @staticmethod
-    def get_cached_link(code: str):
-        data = MockRedisService._cache.get(code)
-        return data.get("url") if data else None
+    def lookup_link(self, code: str):
+        data = self._cache.get(code)
+        return (data["url"].encode(), None, True) if data else (None, None, self.code_status(code))
     
-    @staticmethod
-    def delete_cached_link(code: str) -> bool:
-        MockRedisService._cache.pop(code, None)
+    def forget_links(self, codes, release_codes=True) -> bool:
+        for code in codes:
+            self._cache.pop(code, None)
+            if release_codes:
+                self._codes_set.discard(code)
         return True
     
-    @staticmethod
-    def add_code_to_set(code: str) -> bool:
-        MockRedisService._codes_set.add(code)
+    def add_codes_to_set(self, codes, pipe=None) -> bool:
+        self._codes_set.update(codes)
         return True
     
-    @staticmethod
-    def code_exists(code: str) -> bool:
-        return code in MockRedisService._codes_set
+    def queue_code(self, code: str) -> None:
+        self._codes_set.add(code)
+    
+    def flush_pending_codes(self) -> int:
+        return 0
     
-    @staticmethod
-    def remove_code_from_set(code: str) -> bool:
-        MockRedisService._codes_set.discard(code)
+    def code_filter_exact(self) -> bool:
         return True
     
-    @staticmethod
-    def check_rate_limit(ip: str, limit=None) -> tuple:
-        count = MockRedisService._rate_limits.get(ip, 0)
+    def code_status(self, code: str):
+        # Tests insert rows directly, so the mock never claims "unused"
+        return True if code in self._codes_set else None
+    
+    def check_rate_limit(self, ip: str, limit=None) -> tuple:
+        count = self._rate_limits.get(ip, 0)
         limit = limit or 30
         if count >= limit:
             return False, 0
-        MockRedisService._rate_limits[ip] = count + 1
+        self._rate_limits[ip] = count + 1
         return True, limit - count - 1
     
-    @staticmethod
-    def sync_codes_from_db(codes) -> bool:
-        MockRedisService._codes_set = set(codes)
+    def check_rate_limit_and_code(self, ip: str, code: str, limit=None) -> tuple:
+        allowed, remaining = self.check_rate_limit(ip, limit)
+        return allowed, remaining, self.code_status(code)
+    
+    def init_code_filter(self) -> bool:
+        return False
+    
+    def begin_codes_rebuild(self):
+        return None
+    
+    def mark_codes_complete(self, token) -> bool:
+        return False
+    
+    def sync_codes_from_db(self, codes, token) -> bool:
+        self._codes_set = set(codes)
         return True
     
-    @staticmethod
-    def health_check() -> bool:
+    def cache_api_key(self, key_hash: str, data: dict) -> bool:
+        self._api_keys[key_hash] = dict(data)
+        return True
+    
+    def get_cached_api_key(self, key_hash: str):
+        data = self._api_keys.get(key_hash)
+        return dict(data) if data else None
+    
+    def delete_cached_api_key(self, key_hash: str) -> bool:
+        self._api_keys.pop(key_hash, None)
+        return True
+    
+    def health_check(self) -> bool:
         return True
 
 
-# Patch RedisService before importing other modules
+# Modules that import RedisService by name
+_REDIS_SERVICE_MODULES = (
+    "app.redis_client", "app.services", "app.routes", "app.auth", "app.main", "app.tasks"
+)
+
+
 @pytest.fixture(autouse=True)
 def mock_redis():
-    """Automatically mock Redis for all tests."""
-    MockRedisService.reset()
-    with patch("app.redis_client.RedisService", MockRedisService):
-        with patch("app.services.RedisService", MockRedisService):
-            with patch("app.routes.RedisService", MockRedisService):
-                yield MockRedisService
+    """Automatically mock Redis for all tests with a fresh mock per test."""
+    from app.services import _local_links
+    
+    mock = MockRedisService()
+    _local_links.clear()
+    with ExitStack() as stack:
+        for module in _REDIS_SERVICE_MODULES:
+            stack.enter_context(patch(f"{module}.RedisService", mock))
+        yield mock
 
 
-@pytest.fixture(scope="function")
-def test_db():
-    """Create a test database using SQLite in-memory."""
+@pytest.fixture(scope="session")
+def test_engine():
+    """In-memory SQLite engine with the schema created once per test run."""
     from app.database import Base
     
     engine = create_engine(
@@ -102,30 +134,56 @@ def test_db():
         poolclass=StaticPool
     )
     
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    # pysqlite's implicit BEGIN breaks SAVEPOINT handling; emit BEGIN ourselves
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
     
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
     
-    db = TestingSessionLocal()
+    # Create all tables
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def test_db(test_engine):
+    """
+    Session inside a transaction that is rolled back after each test.
+    Commits and rollbacks in the code under test act on a SAVEPOINT.
+    """
+    connection = test_engine.connect()
+    transaction = connection.begin()
+    db = Session(
+        bind=connection,
+        autoflush=False,
+        join_transaction_mode="create_savepoint"
+    )
     try:
         yield db
     finally:
         db.close()
-        Base.metadata.drop_all(bind=engine)
+        transaction.rollback()
+        connection.close()
 
 
-@pytest.fixture(scope="function")
-def client(test_db, mock_redis):
-    """Create a FastAPI test client with mocked dependencies."""
+# Session the running app hands to get_db; swapped per test by `client`.
+# A plain holder rather than a ContextVar: TestClient serves requests on its
+# own event loop thread, which doesn't inherit the test's context.
+_current_db: dict = {}
+
+
+@pytest.fixture(scope="session")
+def _app_client():
+    """One TestClient (and app lifespan) shared by the whole test run."""
     from app.main import app
     from app.database import get_db
     
     def override_get_db():
-        try:
-            yield test_db
-        finally:
-            pass
+        yield _current_db["session"]
     
     app.dependency_overrides[get_db] = override_get_db
     
@@ -135,6 +193,17 @@ def client(test_db, mock_redis):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(scope="function")
+def client(_app_client, test_db, mock_redis):
+    """FastAPI test client serving this test's database and Redis mock."""
+    _current_db["session"] = test_db
+    try:
+        yield _app_client
+    finally:
+        _current_db.clear()
+        _app_client.cookies.clear()
+
+
 @pytest.fixture
 def sample_url():
     """Sample URL for testing."""
@@ -3,10 +3,6 @@ Integration tests for API endpoints.
 """
 
 import pytest
-import sys
-from pathlib import Path
-
-sys.path.insert(0, str(Path(__file__).parent.parent))
 
 
 class TestShortenEndpoint:
@@ -31,6 +27,23 @@ class TestShortenEndpoint:
         data = response.json()
         assert data["suffix"] == "mycode"
     
+    def test_shorten_issues_single_insert(self, client, test_db, sample_url):
+        """Creating a link should cost one INSERT, with no refresh SELECT."""
+        from sqlalchemy import event
+
+        statements = []
+        listener = lambda *args: statements.append(args[2].split()[0].upper())
+        engine = test_db.get_bind()
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            response = client.post("/api/shorten", json={"url": sample_url})
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert response.status_code == 200
+        assert response.json()["created_at"]
+        # SAVEPOINT/RELEASE come from the test_db fixture's transaction wrapper
+        assert [s for s in statements if s not in ("SAVEPOINT", "RELEASE")] == ["INSERT"]
+
     def test_shorten_with_expiry(self, client, sample_url):
         """Should create a short link with expiry."""
         response = client.post("/api/shorten", json={
@@ -46,6 +59,16 @@ class TestShortenEndpoint:
         response = client.post("/api/shorten", json={"url": "not-a-url"})
         assert response.status_code == 422  # Validation error
     
+    def test_shorten_pathological_urls_rejected(self, client):
+        """Backtracking-bait hosts and oversized URLs should be rejected."""
+        for url in (
+            "http://" + "a." * 1000 + "!",
+            "http://" + ("a" + "-" * 60 + "a.") * 30 + "1",
+            "http://example.com/" + "a" * 5000,
+        ):
+            response = client.post("/api/shorten", json={"url": url})
+            assert response.status_code == 422
+    
     def test_shorten_duplicate_custom_code(self, client, sample_url):
         """Should reject duplicate custom codes."""
         # Create first link
@@ -86,6 +109,17 @@ class TestCheckEndpoint:
         assert data["available"] is False
         assert data["reason"] == "taken"
     
+    def test_check_redis_negative_skips_db(self, client, mock_redis):
+        """A definite miss in the used-codes set should answer without the DB."""
+        from unittest.mock import patch
+        from app.services import LinkService
+        
+        with patch.object(mock_redis, "code_status", return_value=False), \
+                patch.object(LinkService, "is_code_taken") as lookup:
+            response = client.get("/api/check/freshcode")
+        assert response.json() == {"available": True}
+        lookup.assert_not_called()
+    
     def test_check_reserved_code(self, client):
         """Should report reserved codes."""
         response = client.get("/api/check/api")
@@ -111,6 +145,72 @@ class TestPreviewEndpoint:
         data = response.json()
         assert data["original_url"] == sample_url
     
+    def test_preview_etag_revalidation(self, client, sample_url):
+        """Should send a cacheable ETag and answer 304 when it still matches."""
+        client.post("/api/shorten", json={"url": sample_url, "custom_code": "etagged"})
+        
+        response = client.get("/api/preview/etagged")
+        etag = response.headers["etag"]
+        assert "public" in response.headers["cache-control"]
+        
+        response = client.get("/api/preview/etagged", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+    
+    def test_preview_protected_link_not_cached(self, client, sample_url):
+        """Password-protected previews should be uncacheable and carry no ETag."""
+        client.post("/api/shorten", json={
+            "url": sample_url,
+            "custom_code": "lockedpv",
+            "password": "secret123"
+        })
+        
+        response = client.get("/api/preview/lockedpv")
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "private, no-store"
+        assert "etag" not in response.headers
+        
+        response = client.get("/api/preview/lockedpv", headers={"If-None-Match": "*"})
+        assert response.status_code == 200
+    
+    def test_preview_protected_flag_from_db(self, client, test_db, sample_url):
+        """A cache miss should read the protected flag along with the destination."""
+        from app.models import Link
+        from app.utils import utc_now
+        
+        test_db.add(Link(
+            suffix="lockeddb",
+            destination=sample_url,
+            created_at=utc_now(),
+            password_hash="$argon2id$placeholder"
+        ))
+        test_db.commit()
+        
+        response = client.get("/api/preview/lockeddb")
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "private, no-store"
+        assert "etag" not in response.headers
+    
+    def test_cached_preview_skips_db(self, client, test_db, sample_url):
+        """A cached link's preview should need no query, protected or not."""
+        from sqlalchemy import event
+        
+        for code, extra in (("cachedpv", {}), ("cachedlk", {"password": "secret123"})):
+            client.post("/api/shorten", json={"url": sample_url, "custom_code": code, **extra})
+        
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        engine = test_db.get_bind()
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            public = client.get("/api/preview/cachedpv")
+            locked = client.get("/api/preview/cachedlk")
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert "public" in public.headers["cache-control"]
+        assert locked.headers["cache-control"] == "private, no-store"
+        assert statements == []
+    
     def test_preview_nonexistent_link(self, client):
         """Should return 404 for nonexistent link."""
         response = client.get("/api/preview/doesnotexist")
@@ -183,6 +283,41 @@ class TestPasswordProtectedLinks:
             "password": "wrongpassword"
         })
         assert response.status_code == 401
+    
+    def test_unlock_rate_limited(self, client, sample_url, mock_redis):
+        """Should refuse unlock attempts past the limit without verifying."""
+        from unittest.mock import patch
+        
+        client.post("/api/shorten", json={
+            "url": sample_url,
+            "custom_code": "limitpw",
+            "password": "secret123"
+        })
+        
+        with patch.object(mock_redis, "check_rate_limit", return_value=(False, 0)), \
+                patch("app.routes.LinkService.verify_link_password") as verify:
+            response = client.post("/api/unlock/limitpw", json={"password": "secret123"})
+        assert response.status_code == 429
+        verify.assert_not_called()
+    
+    def test_unlock_upgrades_legacy_sha256_hash(self, client, test_db, sample_url):
+        """Old SHA-256 hashes should still unlock and be rehashed with Argon2id."""
+        import hashlib
+        from app.models import Link
+        from app.utils import utc_now
+        
+        test_db.add(Link(
+            suffix="legacypw",
+            destination=sample_url,
+            created_at=utc_now(),
+            password_hash=hashlib.sha256(b"secret123").hexdigest()
+        ))
+        test_db.commit()
+        
+        response = client.post("/api/unlock/legacypw", json={"password": "secret123"})
+        assert response.status_code == 200
+        link = test_db.query(Link).filter(Link.suffix == "legacypw").first()
+        assert link.password_hash.startswith("$argon2id$")
 
 
 class TestOneTimeLinks:
@@ -200,6 +335,74 @@ class TestOneTimeLinks:
         assert data["max_clicks"] == 1
 
 
+class TestRedirect:
+    """Tests for GET /{code}."""
+    
+    def test_redirect_existing_link(self, client, sample_url):
+        """Should redirect to the destination, including repeat hits."""
+        client.post("/api/shorten", json={"url": sample_url, "custom_code": "hop"})
+        for _ in range(2):
+            response = client.get("/hop", follow_redirects=False)
+            assert response.status_code == 301
+            assert response.headers["location"] == sample_url
+    
+    def test_deleted_link_not_served_from_local_cache(self, client, test_db, sample_url):
+        """Deleting a link should evict it from the in-process cache."""
+        from app.auth import create_api_key
+        key, _ = create_api_key(test_db, name="evict")
+        client.post("/api/shorten", json={"url": sample_url, "custom_code": "evictme"})
+        assert client.get("/evictme", follow_redirects=False).status_code == 301
+        
+        client.post("/api/bulk/delete", json={"suffixes": ["evictme"]}, headers={"X-API-Key": key})
+        assert client.get("/evictme", follow_redirects=False).status_code == 404
+
+
+    def test_non_code_path_skips_lookup(self, client):
+        """Paths that can't be a short code should 404 without a lookup."""
+        from unittest.mock import patch
+        import app.main as main
+        
+        with patch.object(main.LinkService, "get_original_url") as lookup:
+            response = client.get("/wp-login.php")
+        assert response.status_code == 404
+        lookup.assert_not_called()
+    
+    def test_unused_code_skips_db(self, client, test_db, mock_redis):
+        """A miss under the codes:complete guard should 404 without a query."""
+        from unittest.mock import patch
+        from sqlalchemy import event
+        
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        engine = test_db.get_bind()
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            with patch.object(mock_redis, "lookup_link", return_value=(None, None, False)):
+                response = client.get("/neverused")
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert response.status_code == 404
+        assert statements == []
+    
+    def test_unguarded_miss_queries_db(self, client, test_db, mock_redis):
+        """Without the guard a miss is inconclusive, so the DB still decides."""
+        from unittest.mock import patch
+        from app.models import Link
+        from app.utils import utc_now
+        
+        test_db.add(Link(
+            suffix="unloaded1",
+            destination="https://example.com/unloaded",
+            created_at=utc_now()
+        ))
+        test_db.commit()
+        
+        with patch.object(mock_redis, "lookup_link", return_value=(None, None, None)):
+            response = client.get("/unloaded1", follow_redirects=False)
+        assert response.status_code in (301, 302, 307, 308)
+        assert response.headers["location"] == "https://example.com/unloaded"
+
+
 class TestHealthEndpoint:
     """Tests for GET /health."""
     
@@ -211,3 +414,90 @@ class TestHealthEndpoint:
         assert "status" in data
         assert "database" in data
         assert "redis" in data
+    
+    def test_health_probe_cached(self, client):
+        """Probes within the cache window should reuse the previous result."""
+        from unittest.mock import patch
+        import app.main as main
+        
+        main._health_cache = None
+        with patch.object(main, "_probe_health", return_value=(True, True)) as probe:
+            client.get("/health")
+            client.get("/health")
+        main._health_cache = None
+        assert probe.call_count == 1
+
+
+class TestBulkEndpoints:
+    """Tests for API-key protected bulk endpoints."""
+    
+    def test_bulk_shorten_requires_api_key(self, client, sample_url):
+        """Should reject bulk requests without an API key."""
+        response = client.post("/api/bulk/shorten", json={"urls": [{"url": sample_url}]})
+        assert response.status_code == 401
+    
+    def test_bulk_shorten_with_api_key(self, client, test_db, sample_url):
+        """Should create links when a valid API key is provided."""
+        from app.auth import create_api_key
+        key, _ = create_api_key(test_db, name="bulk")
+        
+        response = client.post(
+            "/api/bulk/shorten",
+            json={"urls": [{"url": sample_url}, {"url": sample_url, "custom_code": "bulkone"}]},
+            headers={"X-API-Key": key}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success_count"] == 2
+        assert data["error_count"] == 0
+    
+    def test_bulk_shorten_reports_taken_codes(self, client, test_db, sample_url):
+        """Should reject codes already in the DB or repeated within the batch."""
+        from app.auth import create_api_key
+        key, _ = create_api_key(test_db, name="taken")
+        client.post("/api/shorten", json={"url": sample_url, "custom_code": "existing"})
+        
+        response = client.post(
+            "/api/bulk/shorten",
+            json={"urls": [
+                {"url": sample_url, "custom_code": "existing"},
+                {"url": sample_url, "custom_code": "twice"},
+                {"url": sample_url, "custom_code": "Twice"},
+                {"url": sample_url},
+            ]},
+            headers={"X-API-Key": key}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [r["success"] for r in data["results"]] == [False, True, False, True]
+        assert data["results"][1]["suffix"] == "twice"
+        assert client.get("/api/stats/twice").status_code == 200
+    
+    def test_bulk_shorten_with_bearer_token(self, client, test_db, sample_url):
+        """Should accept the key as a Bearer token."""
+        from app.auth import create_api_key
+        key, _ = create_api_key(test_db, name="bearer")
+        
+        response = client.post(
+            "/api/bulk/shorten",
+            json={"urls": [{"url": sample_url}]},
+            headers={"Authorization": f"Bearer {key}"}
+        )
+        assert response.status_code == 200
+    
+    def test_bulk_delete(self, client, test_db, sample_url):
+        """Should delete existing links and report missing ones."""
+        from app.auth import create_api_key
+        key, _ = create_api_key(test_db, name="delete")
+        client.post("/api/shorten", json={"url": sample_url, "custom_code": "todelete"})
+        
+        response = client.post(
+            "/api/bulk/delete",
+            json={"suffixes": ["todelete", "missing"]},
+            headers={"X-API-Key": key}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["deleted_count"] == 1
+        assert data["not_found"] == ["missing"]
+        assert client.get("/api/stats/todelete").status_code == 404
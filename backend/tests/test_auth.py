@@ -0,0 +1,228 @@
+"""
+Unit tests for API key authentication.
+"""
+
+import pytest
+
+from app.auth import (
+    API_KEY_LENGTH,
+    API_KEY_PREFIX,
+    create_api_key,
+    flush_api_key_usage,
+    generate_api_key,
+    hash_api_key,
+    record_api_key_usage,
+    validate_api_key,
+)
+
+
+class TestGenerateApiKey:
+    """Tests for generate_api_key function."""
+
+    def test_key_has_prefix_and_length(self):
+        """Generated keys should carry the prefix and fixed length."""
+        key, _ = generate_api_key()
+        assert key.startswith(API_KEY_PREFIX)
+        assert len(key) == API_KEY_LENGTH
+
+    def test_hash_matches_key(self):
+        """Returned hash should be the SHA-256 of the key."""
+        key, key_hash = generate_api_key()
+        assert key_hash == hash_api_key(key)
+        assert len(key_hash) == 64
+
+    def test_hash_accepts_bytes(self):
+        """Hashing bytes should match hashing the equivalent str."""
+        key, key_hash = generate_api_key()
+        assert hash_api_key(key.encode("ascii")) == key_hash
+
+
+class TestValidateApiKey:
+    """Tests for validate_api_key function."""
+
+    def test_valid_key(self, test_db):
+        """A freshly created key should validate."""
+        key, api_key = create_api_key(test_db, name="test")
+        result = validate_api_key(test_db, key)
+        assert result is not None
+        assert result.id == api_key.id
+
+    def test_wrong_length_rejected(self, test_db):
+        """Keys with the right prefix but wrong length should be rejected."""
+        create_api_key(test_db, name="test")
+        assert validate_api_key(test_db, API_KEY_PREFIX + "short") is None
+
+    def test_wrong_prefix_rejected(self, test_db):
+        """Keys without the prefix should be rejected."""
+        key, _ = create_api_key(test_db, name="test")
+        assert validate_api_key(test_db, "xxx_" + key[4:]) is None
+
+    def test_non_ascii_key_rejected(self, test_db):
+        """Keys containing non-ASCII characters should be rejected."""
+        key, _ = create_api_key(test_db, name="test")
+        assert validate_api_key(test_db, key[:-1] + "\u00e9") is None
+
+    def test_empty_key_rejected(self, test_db):
+        """Empty keys should be rejected."""
+        assert validate_api_key(test_db, "") is None
+
+
+class TestApiKeyUsageFlush:
+    """Tests for batched last_used_at updates."""
+
+    def test_usage_written_on_flush(self, test_db):
+        """Validation should defer last_used_at until the next flush."""
+        key, api_key = create_api_key(test_db, name="test")
+        validate_api_key(test_db, key)
+        test_db.refresh(api_key)
+        assert api_key.last_used_at is None
+
+        assert flush_api_key_usage(test_db) == 1
+        test_db.refresh(api_key)
+        assert api_key.last_used_at is not None
+
+    def test_flush_empty_is_noop(self, test_db):
+        """Flushing with nothing queued should do nothing."""
+        flush_api_key_usage(test_db)
+        assert flush_api_key_usage(test_db) == 0
+
+    def test_flush_never_moves_backwards(self, test_db):
+        """An older queued timestamp should not overwrite a newer one."""
+        from datetime import timedelta
+        from app.utils import utc_now
+
+        _, api_key = create_api_key(test_db, name="test")
+        now = utc_now()
+        record_api_key_usage(api_key.id, now)
+        flush_api_key_usage(test_db)
+
+        record_api_key_usage(api_key.id, now - timedelta(hours=1))
+        flush_api_key_usage(test_db)
+        test_db.refresh(api_key)
+        assert api_key.last_used_at.replace(tzinfo=None) == now.replace(tzinfo=None)
+
+
+class TestDeactivateApiKey:
+    """Tests for deactivate_api_key function."""
+
+    def test_deactivated_key_rejected(self, test_db):
+        """A deactivated key should no longer validate."""
+        from app.auth import deactivate_api_key
+
+        key, api_key = create_api_key(test_db, name="test")
+        assert deactivate_api_key(test_db, api_key.id) is True
+        assert validate_api_key(test_db, key) is None
+
+    def test_unknown_id(self, test_db):
+        """Deactivating a missing key should return False."""
+        from app.auth import deactivate_api_key
+
+        assert deactivate_api_key(test_db, 9999) is False
+
+
+class TestApiKeyCache:
+    """Tests for the Redis-backed API key cache."""
+
+    def test_second_lookup_served_from_cache(self, test_db, mock_redis):
+        """A validated key should be cached and reused without the DB row."""
+        key, api_key = create_api_key(test_db, name="cached", rate_limit=42)
+        validate_api_key(test_db, key)
+        assert hash_api_key(key) in mock_redis._api_keys
+
+        result = validate_api_key(test_db, key)
+        assert result.id == api_key.id
+        assert result.rate_limit == 42
+        assert result.name == "cached"
+
+    def test_deactivate_invalidates_cache(self, test_db, mock_redis):
+        """Deactivating a key should drop it from the cache."""
+        from app.auth import deactivate_api_key
+
+        key, api_key = create_api_key(test_db, name="test")
+        validate_api_key(test_db, key)
+        deactivate_api_key(test_db, api_key.id)
+        assert hash_api_key(key) not in mock_redis._api_keys
+        assert validate_api_key(test_db, key) is None
+
+
+class TestActiveKeyFilter:
+    """Tests for the in-memory active key filter."""
+
+    @pytest.fixture(autouse=True)
+    def reset_filter(self):
+        import app.auth as auth
+        auth._miss_window_start = float("-inf")
+        auth._rejected_key_hashes.clear()
+        yield
+        auth._active_key_hashes = None
+        auth._miss_window_start = float("-inf")
+        auth._rejected_key_hashes.clear()
+
+    def test_unknown_key_rejected_by_filter(self, test_db):
+        """Once loaded, keys not in the filter are rejected."""
+        from app.auth import load_active_key_filter
+
+        create_api_key(test_db, name="known")
+        assert load_active_key_filter(test_db) == 1
+        unknown, _ = generate_api_key()
+        assert validate_api_key(test_db, unknown) is None
+
+    def test_new_key_added_to_filter(self, test_db):
+        """Keys created in-process are accepted immediately."""
+        from app.auth import load_active_key_filter
+
+        load_active_key_filter(test_db)
+        key, _ = create_api_key(test_db, name="new")
+        assert validate_api_key(test_db, key) is not None
+
+    def test_key_created_elsewhere_accepted(self, test_db):
+        """A key missing from the loaded filter is found by the miss lookup."""
+        import app.auth as auth
+        from app.auth import load_active_key_filter
+
+        load_active_key_filter(test_db)
+        key, _ = create_api_key(test_db, name="cli")
+        # Simulate another process having created the key
+        auth._active_key_hashes = frozenset()
+        assert validate_api_key(test_db, key) is not None
+        assert hash_api_key(key) in auth._active_key_hashes
+
+    def test_rejected_key_not_looked_up_again(self, test_db):
+        """A key the DB rejected is refused without another query."""
+        from unittest.mock import patch
+        from app.auth import load_active_key_filter
+
+        load_active_key_filter(test_db)
+        unknown, _ = generate_api_key()
+        with patch.object(test_db, "execute", wraps=test_db.execute) as execute:
+            for _ in range(5):
+                assert validate_api_key(test_db, unknown) is None
+        assert execute.call_count == 1
+
+    def test_repeated_bad_key_leaves_new_keys_working(self, test_db):
+        """Retrying a bad key shouldn't use up the lookups a new key needs."""
+        from unittest.mock import patch
+        import app.auth as auth
+        from app.auth import load_active_key_filter
+
+        load_active_key_filter(test_db)
+        unknown, _ = generate_api_key()
+        with patch.object(auth, "API_KEY_FILTER_MISS_LOOKUPS_PER_SECOND", 2):
+            for _ in range(5):
+                assert validate_api_key(test_db, unknown) is None
+            key, _ = create_api_key(test_db, name="cli")
+            auth._active_key_hashes = frozenset()
+            assert validate_api_key(test_db, key) is not None
+
+    def test_filter_miss_lookups_capped(self, test_db):
+        """Distinct unknown keys beyond the per-second cap skip the DB."""
+        from unittest.mock import patch
+        import app.auth as auth
+        from app.auth import load_active_key_filter
+
+        load_active_key_filter(test_db)
+        with patch.object(auth, "API_KEY_FILTER_MISS_LOOKUPS_PER_SECOND", 3), \
+                patch.object(test_db, "execute", wraps=test_db.execute) as execute:
+            for _ in range(5):
+                assert validate_api_key(test_db, generate_api_key()[0]) is None
+        assert execute.call_count == 3
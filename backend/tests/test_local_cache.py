@@ -0,0 +1,51 @@
+"""
+Unit tests for the in-process TTL cache.
+"""
+
+from app.local_cache import TTLCache
+
+
+class TestTTLCache:
+    """Tests for TTLCache."""
+    
+    def test_get_set(self):
+        """Stored values should be returned until removed."""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", "https://example.com")
+        assert cache.get("a") == "https://example.com"
+        cache.pop("a")
+        assert cache.get("a") is None
+    
+    def test_expired_entry_dropped(self, monkeypatch):
+        """Entries should expire after their TTL."""
+        import app.local_cache as local_cache
+        
+        now = [1000.0]
+        monkeypatch.setattr(local_cache.time, "monotonic", lambda: now[0])
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", "x", ttl=5)
+        now[0] += 6
+        assert cache.get("a") is None
+        assert len(cache) == 0
+    
+    def test_ttl_capped_at_default(self, monkeypatch):
+        """A longer per-entry TTL should be capped at the cache default."""
+        import app.local_cache as local_cache
+        
+        now = [1000.0]
+        monkeypatch.setattr(local_cache.time, "monotonic", lambda: now[0])
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", "x", ttl=3600)
+        now[0] += 61
+        assert cache.get("a") is None
+    
+    def test_evicts_least_recently_used(self):
+        """The least recently used entry should be evicted when full."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
@@ -0,0 +1,81 @@
+"""
+Tests for RedisService's used-codes tracking against an in-memory Redis.
+"""
+
+import fakeredis
+import pytest
+
+import app.redis_client as redis_module
+from app.redis_client import RedisService
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Point the real RedisService at a fresh fakeredis instance."""
+    client = fakeredis.FakeRedis()
+    # The autouse mock_redis fixture swaps the module's RedisService out
+    monkeypatch.setattr(redis_module, "RedisService", RedisService)
+    monkeypatch.setattr(redis_module, "redis_client", client)
+    monkeypatch.setattr(redis_module, "USE_REDIS", True)
+    monkeypatch.setattr(redis_module, "_use_bloom", False)
+    monkeypatch.setattr(redis_module, "_pending_codes", set())
+    monkeypatch.setattr(
+        redis_module, "_codes_rebuild_script", client.register_script(redis_module._CODES_REBUILD_LUA)
+    )
+    return client
+
+
+class TestCodesCompleteGuard:
+    """Misses are only trusted once a full rebuild has set codes:complete."""
+
+    def test_miss_without_guard_is_unknown(self, fake_redis):
+        """A loaded set alone shouldn't rule a code out."""
+        RedisService.add_codes_to_set(["used1"])
+        assert RedisService.code_status("used1") is True
+        assert RedisService.code_status("other1") is None
+
+    def test_warmup_sets_guard(self, fake_redis):
+        """A finished warm-up should make misses definite."""
+        token = RedisService.begin_codes_rebuild()
+        RedisService.add_codes_to_set(["used1"])
+        assert RedisService.mark_codes_complete(token) is True
+        assert RedisService.code_status("other1") is False
+        assert RedisService.lookup_link("other1") == (None, None, False)
+
+    def test_flush_during_warmup_voids_guard(self, fake_redis):
+        """A FLUSHDB mid warm-up (another worker starting) should keep misses unknown."""
+        token = RedisService.begin_codes_rebuild()
+        fake_redis.flushdb()
+        RedisService.add_codes_to_set(["used1"])
+        assert RedisService.mark_codes_complete(token) is False
+        assert RedisService.code_status("other1") is None
+
+    def test_sync_keeps_codes_flushed_during_rebuild(self, fake_redis):
+        """Codes flushed after the DB read began should survive the swap."""
+        token = RedisService.begin_codes_rebuild()
+        RedisService.queue_code("late1")
+        assert RedisService.flush_pending_codes() == 1
+        assert RedisService.sync_codes_from_db(["old1", "old2"], token) is True
+        assert RedisService.code_status("late1") is True
+        assert RedisService.code_status("old1") is True
+        assert RedisService.code_status("other1") is False
+        assert fake_redis.ttl(RedisService.CODES_SET) == -1
+
+    def test_released_code_not_restored_by_sync(self, fake_redis):
+        """Deleting a link should keep its code out of the next swap."""
+        token = RedisService.begin_codes_rebuild()
+        RedisService.queue_code("gone1")
+        RedisService.flush_pending_codes()
+        RedisService.forget_links(["gone1"])
+        RedisService.sync_codes_from_db(["old1"], token)
+        assert RedisService.code_status("gone1") is False
+
+    def test_sync_after_flush_is_skipped(self, fake_redis):
+        """A sync voided by FLUSHDB shouldn't swap in or set the guard."""
+        token = RedisService.begin_codes_rebuild()
+        fake_redis.flushdb()
+        RedisService.add_codes_to_set(["new1"])
+        assert RedisService.sync_codes_from_db(["old1"], token) is False
+        assert RedisService.code_status("new1") is True
+        assert RedisService.code_status("other1") is None
+        assert not fake_redis.keys(f"{RedisService.CODES_SET}:rebuild:*")
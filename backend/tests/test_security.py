@@ -3,10 +3,6 @@ Unit tests for security module.
 """
 
 import pytest
-import sys
-from pathlib import Path
-
-sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.security import (
     is_private_ip,
@@ -3,10 +3,7 @@ Unit tests for utility functions.
 """
 
 import pytest
-import sys
-from pathlib import Path
-
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from datetime import datetime, timedelta, timezone
 
 from app.utils import (
     generate_short_code,
@@ -14,7 +11,9 @@ from app.utils import (
     extract_domain,
     is_reserved_code,
     format_short_url,
-    utc_now
+    utc_now,
+    utc_now_coarse,
+    normalize_utc
 )
 
 
@@ -26,6 +25,20 @@ class TestGenerateShortCode:
         code = generate_short_code()
         assert len(code) >= 6  # Default minimum length
     
+    def test_explicit_length(self):
+        """An explicit length should be honoured exactly."""
+        for length in (1, 7, 40):
+            assert len(generate_short_code(length)) == length
+    
+    def test_generates_code_batches(self):
+        """Batch generation should return the requested number of codes."""
+        from app.utils import generate_short_codes
+        
+        codes = generate_short_codes(50, 8)
+        assert len(codes) == 50
+        assert all(len(code) == 8 and code.isalnum() and code == code.lower() for code in codes)
+        assert len(set(codes)) == 50
+    
     def test_generates_unique_codes(self):
         """Generated codes should be unique."""
         codes = [generate_short_code() for _ in range(100)]
@@ -131,3 +144,35 @@ class TestUtcNow:
         """Should have UTC timezone."""
         result = utc_now()
         assert result.tzinfo is not None
+
+
+class TestUtcNowCoarse:
+    """Tests for utc_now_coarse function."""
+    
+    def test_has_timezone(self):
+        """Should return a UTC-aware datetime."""
+        assert utc_now_coarse().tzinfo is not None
+    
+    def test_close_to_now(self):
+        """Should be within about a second of the precise time."""
+        delta = abs((utc_now() - utc_now_coarse()).total_seconds())
+        assert delta < 1.5
+
+
+class TestNormalizeUtc:
+    """Tests for normalize_utc function."""
+    
+    def test_naive_assumed_utc(self):
+        """Naive datetimes should be tagged as UTC."""
+        assert normalize_utc(datetime(2024, 1, 1)).tzinfo is timezone.utc
+    
+    def test_utc_returned_unchanged(self):
+        """Already-UTC datetimes should be returned as-is."""
+        now = utc_now()
+        assert normalize_utc(now) is now
+    
+    def test_offset_converted(self):
+        """Other offsets should be converted to UTC."""
+        dt = datetime(2024, 1, 1, 5, 30, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+        assert normalize_utc(dt) == datetime(2024, 1, 1, tzinfo=timezone.utc)
+        assert normalize_utc(dt).tzinfo is timezone.utc